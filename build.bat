@@ -11,6 +11,9 @@ echo Installing requirements...
 python -m pip install --upgrade pip
 pip install -r requirements.txt
 
+echo Compiling domain mapping index...
+python src\merge_mappings.py
+
 echo Building executable...
 pyinstaller --clean ^
            --windowed ^
@@ -18,6 +21,15 @@ pyinstaller --clean ^
            --hidden-import PIL ^
            --hidden-import PIL._imagingtk ^
            --hidden-import PIL._tkinter_finder ^
+           --hidden-import PIL.Image ^
+           --hidden-import PIL.ImageTk ^
+           --hidden-import requests ^
+           --hidden-import tqdm ^
+           --hidden-import pypinyin ^
+           --add-data "domain_mappings.json;." ^
+           --add-data "domains.json;." ^
+           --add-data "domain_mappings\*.json;domain_mappings" ^
+           --add-data "domain_mappings.index.json;." ^
            icon_downloader_gui.py ^
            --name "Icon Downloader"
 
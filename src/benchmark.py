@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark_server import BENCHMARK_ENDPOINTS, DEFAULT_SIZES, SERVICE_HOSTS, BenchmarkConfig, comma_names, comma_sizes, serve
+from concurrency import DEFAULT_HOST_RATES
+from icon_downloader import IconDownloader
+
+
+SCENARIOS = ('download', 'search', 'direct')
+
+
+def percentile(values, p):
+    """最近秩法的百分位数，没有数据返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def peak_rss_mb():
+    """本进程启动以来的峰值常驻内存（MB），无法获取返回None"""
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                    'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize / 2 ** 20
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位是 KB，macOS 上是字节
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def timed_map(fn, items, workers):
+    """用 workers 个线程对每一项调用 fn，返回 (各项耗时, 各项结果)"""
+    def timed(item):
+        start = time.perf_counter()
+        result = fn(item)
+        return time.perf_counter() - start, result
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        timings = list(pool.map(timed, items))
+    return [seconds for seconds, _ in timings], [result for _, result in timings]
+
+
+def run_download(downloader, count, args):
+    """download_icons：完整流程（所有图标服务 + 直接下载），按域名计时"""
+    domains = [f"bench-site-{i:05d}.com" for i in range(count)]
+    latencies = []
+    download_one = downloader.download_one
+
+    def timed_download_one(*a, **kw):
+        start = time.perf_counter()
+        try:
+            return download_one(*a, **kw)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    # download_icons 内部逐个调用 download_one，替换实例属性即可得到每个名称的耗时
+    downloader.download_one = timed_download_one
+    results = downloader.download_icons(domains, args.size, strategy=args.strategy)
+    return latencies, sum(1 for result in results if result and result.get('icons'))
+
+
+def run_search(downloader, count, args):
+    """search_domain：每个名称并发发出三个 Bing 查询并打分"""
+    names = [f"benchbrand{i:05d}" for i in range(count)]
+    latencies, results = timed_map(downloader.search_domain, names, args.workers)
+    return latencies, sum(1 for name, domain in zip(names, results) if domain == f"{name}.com")
+
+
+def run_direct(downloader, count, args):
+    """download_direct_favicon：首页解析 + 惯例路径探测"""
+    domains = [f"bench-direct-{i:05d}.com" for i in range(count)]
+    latencies, results = timed_map(lambda domain: downloader.download_direct_favicon(domain, args.size),
+                                   domains, args.workers)
+    return latencies, sum(1 for result in results if result)
+
+
+RUNNERS = {
+    'download': run_download,
+    'search': run_search,
+    'direct': run_direct,
+}
+
+
+def run_scenario(scenario, port, args):
+    """在独立的临时目录中运行一个场景（不使用也不污染正常的缓存），返回结果字典"""
+    work_dir = tempfile.mkdtemp(prefix=f'icon-bench-{scenario}-')
+    # 默认取消上游主机的限速，测的是程序本身的吞吐；--rate-limits 时按线上配置限速
+    host_rates = None if args.rate_limits else {host: None for host in DEFAULT_HOST_RATES}
+    log = sys.stdout if args.verbose else open(os.devnull, 'w')
+    with contextlib.redirect_stdout(log):
+        downloader = IconDownloader(max_workers=args.workers,
+                                    max_connections=args.connections,
+                                    per_host_limit=args.per_host,
+                                    host_rates=host_rates,
+                                    output_dir=os.path.join(work_dir, 'icons'),
+                                    cache_dir=os.path.join(work_dir, 'cache'),
+                                    endpoints=BENCHMARK_ENDPOINTS,
+                                    proxies={'http': f'http://127.0.0.1:{port}'})
+    try:
+        with contextlib.redirect_stdout(log):
+            start = time.perf_counter()
+            latencies, ok = RUNNERS[scenario](downloader, args.count, args)
+            elapsed = time.perf_counter() - start
+    finally:
+        downloader.image_pipeline.shutdown()
+        if log is not sys.stdout:
+            log.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        'scenario': scenario,
+        'names': args.count,
+        'ok': ok,
+        'seconds': round(elapsed, 3),
+        'names_per_sec': round(args.count / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        'peak_rss_mb': round(peak_rss_mb() or 0, 1) or None,
+        # 各阶段耗时（只写入 -o 的 JSONL，不在表格中显示）
+        'stages': downloader.metrics.summary()['stages'],
+    }
+
+
+def print_table(results):
+    print(f"{'场景':<10}{'名称数':>8}{'成功':>8}{'耗时(s)':>10}{'名称/秒':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'峰值RSS(MB)':>13}")
+    for r in results:
+        cells = [r['names'], r['ok'], r['seconds'], r['names_per_sec'], r['p50_ms'], r['p99_ms'], r['peak_rss_mb']]
+        widths = [8, 8, 10, 10, 10, 10, 13]
+        print(f"{r['scenario']:<10}" + ''.join(f"{'-' if c is None else c:>{w}}" for c, w in zip(cells, widths)))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="离线基准测试：启动模拟图标服务/Bing/网站的本地服务，"
+                    "大批量运行 download_icons、search_domain 和 download_direct_favicon，"
+                    "报告 名称/秒、p50/p99 延迟和峰值内存。")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"要运行的场景，逗号分隔（{','.join(SCENARIOS)}），默认全部")
+    parser.add_argument('-n', '--count', type=int, default=200, help="每个场景的名称数（默认 200）")
+    parser.add_argument('-j', '--workers', type=int, default=8, help="同时处理的名称数（默认 8）")
+    parser.add_argument('--connections', type=int, default=32, help="全局最大并发请求数（默认 32）")
+    parser.add_argument('--per-host', type=int, default=4, help="单个主机最大并发请求数（默认 4）")
+    parser.add_argument('--rate-limits', action='store_true', help="按线上配置对上游主机限速（默认不限速）")
+    parser.add_argument('-s', '--size', type=int, default=256, help="图标尺寸（默认 256）")
+    parser.add_argument('--strategy', choices=('all', 'best', 'hedged'), default='all',
+                        help="download 场景的下载策略")
+    parser.add_argument('--latency', type=float, default=50, help="模拟服务每个响应的平均延迟（毫秒，默认 50）")
+    parser.add_argument('--jitter', type=float, default=20, help="延迟的随机浮动范围（毫秒，默认 20）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="模拟服务返回 503 的比例（0~1，默认 0）")
+    parser.add_argument('--down', type=comma_names, default=(),
+                        help=f"始终返回 503 的服务，逗号分隔（{','.join(SERVICE_HOSTS.values())}），用于测试断路器")
+    parser.add_argument('--missing-rate', type=float, default=0.1, help="没有图标的域名比例（默认 0.1）")
+    parser.add_argument('--sizes', type=comma_sizes, default=DEFAULT_SIZES, help="模拟图标的尺寸，逗号分隔")
+    parser.add_argument('-o', '--output', help="把本次结果（含配置）追加到这个 JSONL 文件，便于比较各版本")
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出下载过程日志")
+    return parser
+
+
+def main(argv=None):
+    multiprocessing.freeze_support()
+    args = build_parser().parse_args(argv)
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = [s for s in scenarios if s not in RUNNERS]
+    if unknown:
+        raise SystemExit(f"未知的场景: {', '.join(unknown)}（可选: {', '.join(SCENARIOS)}）")
+
+    # 模拟服务在单独的进程中运行，不占用被测进程的 CPU 和内存
+    config = BenchmarkConfig(args.latency, args.jitter, args.error_rate, args.sizes, args.missing_rate,
+                             down=args.down)
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(config, ready), daemon=True)
+    server.start()
+    try:
+        port = ready.get(timeout=30)
+        results = []
+        for scenario in scenarios:
+            print(f"运行 {scenario}（{args.count} 个名称）...", file=sys.stderr)
+            results.append(run_scenario(scenario, port, args))
+    finally:
+        server.terminate()
+        server.join()
+
+    print_table(results)
+    if args.output:
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'config': {key: value for key, value in vars(args).items() if key not in ('output', 'verbose', 'scenarios')},
+            'results': results,
+        }
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+import io
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from PIL import Image
+
+
+# 模拟的上游主机，其余主机都当作普通网站
+SERVICE_HOSTS = {
+    'www.google.com': 'google',
+    'icons.duckduckgo.com': 'duckduckgo',
+    'favicon.yandex.net': 'yandex',
+    'ico.kucat.cn': 'kucat',
+    'www.bing.com': 'bing',
+    'fanyi.baidu.com': 'baidu',
+    'fanyi.youdao.com': 'youdao',
+}
+# 基准测试中 IconDownloader 使用的接口地址：主机名与线上一致（限流、单主机并发按真实主机生效），
+# 改用 http 以便经由本服务代理
+BENCHMARK_ENDPOINTS = {
+    'Google Favicon': 'http://www.google.com/s2/favicons?domain={domain}&sz={size}',
+    'DuckDuckGo': 'http://icons.duckduckgo.com/ip3/{domain}.ico',
+    'Yandex': 'http://favicon.yandex.net/favicon/{domain}',
+    'ico.kucat.cn': 'http://ico.kucat.cn/get.php?url={domain}',
+    'bing': 'http://www.bing.com/search?q={query}',
+    'baidu_translate': 'http://fanyi.baidu.com/sug',
+    'youdao_translate': 'http://fanyi.youdao.com/translate?&doctype=json&type=AUTO&i={text}',
+    'homepages': ('http://{domain}', 'http://www.{domain}'),
+}
+DEFAULT_SIZES = (16, 32, 64, 128, 180, 256)
+# 搜索结果页中混入的无关结果
+NOISE_SITES = ('zh.wikipedia.org', 'baike.baidu.com', 'www.zhihu.com', 'www.163.com')
+# 网站首页 <head> 之后的填充，模拟真实页面的大小
+PAGE_FILLER = '<p>' + 'lorem ipsum dolor sit amet ' * 40 + '</p>\n'
+
+
+class BenchmarkConfig:
+    """模拟服务的行为：每个响应的延迟（latency ± jitter 毫秒）、返回 503 的比例和图标尺寸
+
+    每个域名的图标尺寸、是否有图标由域名的哈希决定，同一配置下多次运行结果一致；
+    错误按 error_rate 随机注入（seed 固定）。down 中的服务（SERVICE_HOSTS 的值）始终返回 503。
+    """
+
+    def __init__(self, latency=50, jitter=20, error_rate=0.0, sizes=DEFAULT_SIZES, missing_rate=0.1, seed=1, down=()):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.sizes = tuple(sizes)
+        self.missing_rate = missing_rate
+        self.seed = seed
+        self.down = tuple(down)
+
+
+def domain_random(domain, salt=''):
+    """由域名决定的随机数发生器"""
+    return random.Random(zlib.crc32(f"{salt}:{domain.lower()}".encode('utf-8')))
+
+
+def site_domain(host):
+    host = host.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class IconFactory:
+    """预先生成各尺寸的 PNG 和 ICO，响应时直接返回字节"""
+
+    def __init__(self, sizes):
+        self.png = {}
+        self.ico = {}
+        for size in sorted(set(sizes) | {16, 32}):
+            image = Image.new('RGBA', (size, size), (size * 7 % 256, 120, 200, 255))
+            buffer = io.BytesIO()
+            image.save(buffer, 'PNG')
+            self.png[size] = buffer.getvalue()
+            buffer = io.BytesIO()
+            image.save(buffer, 'ICO', sizes=[(min(size, 256), min(size, 256))])
+            self.ico[size] = buffer.getvalue()
+
+    def nearest(self, size):
+        """不超过 size 的最大预生成尺寸"""
+        fitting = [s for s in self.png if s <= size]
+        return max(fitting) if fitting else min(self.png)
+
+
+class BenchmarkHandler(BaseHTTPRequestHandler):
+    """按主机名分派：SERVICE_HOSTS 中的主机模拟对应的接口，其他主机模拟普通网站
+
+    既接受直接请求，也接受代理形式的请求（请求行是完整网址），
+    因此 IconDownloader 以本服务为 http 代理时，可以照常使用线上主机名。
+    """
+
+    protocol_version = 'HTTP/1.1'
+    config = BenchmarkConfig()
+    icons = None
+    _random = random.Random(1)
+    _random_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def send_text(self, status, text, content_type='text/html; charset=utf-8'):
+        self.send_body(status, text.encode('utf-8'), content_type)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        self.do_GET()
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        host = (parts.hostname or self.headers.get('Host', '')).split(':')[0].lower()
+        params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+
+        config = self.config
+        with self._random_lock:
+            delay = max(0.0, config.latency + self._random.uniform(-config.jitter, config.jitter)) / 1000
+            failed = self._random.random() < config.error_rate
+        service = SERVICE_HOSTS.get(host)
+        time.sleep(delay)
+        if failed or service in config.down:
+            self.send_text(503, 'Service Unavailable', 'text/plain')
+            return
+
+        if service is None:
+            self.handle_site(host, parts.path)
+        else:
+            getattr(self, f'handle_{service}')(parts.path, params)
+
+    def domain_icon(self, domain, salt):
+        """域名在某个来源的图标尺寸，没有图标返回None"""
+        rng = domain_random(domain, salt)
+        if rng.random() < self.config.missing_rate:
+            return None
+        return rng.choice(self.config.sizes)
+
+    def send_png(self, size):
+        if size is None:
+            self.send_text(404, 'Not Found', 'text/plain')
+        else:
+            self.send_body(200, self.icons.png[self.icons.nearest(size)], 'image/png')
+
+    def handle_google(self, path, params):
+        size = self.domain_icon(params.get('domain', ''), 'google')
+        # 没有图标时 Google 返回默认的 16px 地球图标
+        self.send_png(min(size or 16, int(params.get('sz') or 16)))
+
+    def handle_duckduckgo(self, path, params):
+        domain = unquote(path.rsplit('/', 1)[-1])[:-len('.ico')]
+        size = self.domain_icon(domain, 'duckduckgo')
+        if size is None:
+            self.send_text(404, 'Not Found', 'text/plain')
+        else:
+            self.send_body(200, self.icons.ico[self.icons.nearest(min(size, 256))], 'image/x-icon')
+
+    def handle_yandex(self, path, params):
+        # Yandex 只提供 16px 图标
+        self.send_png(16 if self.domain_icon(unquote(path.rsplit('/', 1)[-1]), 'yandex') else None)
+
+    def handle_kucat(self, path, params):
+        self.send_png(self.domain_icon(params.get('url', ''), 'kucat'))
+
+    def handle_bing(self, path, params):
+        """搜索结果页：查询的第一个词作为品牌，结果中有它的官网和几个无关网站"""
+        words = params.get('q', '').split()
+        brand = ''.join(ch for ch in (words[0] if words else '').lower() if ch.isalnum())
+        results = list(NOISE_SITES)
+        if brand:
+            results.insert(domain_random(brand, 'bing').randrange(len(results) + 1), f"www.{brand}.com")
+        items = ''.join(f'<li class="b_algo"><h2><a href="https://{site}/">{site}</a></h2>'
+                        f'<cite>https://{site}</cite></li>\n' for site in results)
+        self.send_text(200, f'<html><head><title>{brand}</title></head><body><ol id="b_results">\n{items}</ol>'
+                            f'{PAGE_FILLER * 20}</body></html>')
+
+    def handle_baidu(self, path, params):
+        self.send_text(200, json.dumps({'errno': 0, 'data': []}), 'application/json')
+
+    def handle_youdao(self, path, params):
+        self.send_text(200, json.dumps({'translateResult': []}), 'application/json')
+
+    def handle_site(self, host, path):
+        """普通网站：首页声明一个图标和 manifest，另有 /favicon.ico"""
+        domain = site_domain(host)
+        size = self.domain_icon(domain, 'site')
+        if path in ('', '/'):
+            links = ''
+            if size:
+                links = (f'<link rel="icon" sizes="{size}x{size}" href="/static/icon-{size}.png">\n'
+                         '<link rel="manifest" href="/manifest.json">\n')
+            self.send_text(200, f'<html><head><title>{domain}</title>\n{links}</head>'
+                                f'<body>{PAGE_FILLER * 50}</body></html>')
+        elif path == '/manifest.json' and size:
+            manifest = {'name': domain, 'icons': [{'src': f'/static/icon-{size}.png', 'sizes': f'{size}x{size}'}]}
+            self.send_text(200, json.dumps(manifest), 'application/manifest+json')
+        elif path == f'/static/icon-{size}.png':
+            self.send_png(size)
+        elif path == '/favicon.ico':
+            self.send_body(200, self.icons.ico[16], 'image/x-icon')
+        else:
+            self.send_text(404, 'Not Found')
+
+
+class BenchmarkHTTPServer(ThreadingHTTPServer):
+    # 基准测试时连接数很多，加大监听队列避免连接被拒绝
+    request_queue_size = 256
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端读到需要的内容后提前断开（例如只读取首页的 <head>）是正常情况
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def make_server(config, host='127.0.0.1', port=0):
+    """创建模拟服务（port=0 时自动选择端口）"""
+    handler = type('ConfiguredBenchmarkHandler', (BenchmarkHandler,), {
+        'config': config,
+        'icons': IconFactory(config.sizes),
+        '_random': random.Random(config.seed),
+    })
+    return BenchmarkHTTPServer((host, port), handler)
+
+
+def serve(config, ready=None, host='127.0.0.1', port=0):
+    """运行模拟服务直到进程结束；ready 是可选的队列，用来告知实际端口"""
+    server = make_server(config, host, port)
+    if ready is not None:
+        ready.put(server.server_address[1])
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def comma_sizes(value):
+    return tuple(int(size) for size in value.split(',') if size.strip())
+
+
+def comma_names(value):
+    return tuple(name.strip() for name in value.split(',') if name.strip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="模拟图标服务、Bing 搜索和普通网站的本地服务，供离线基准测试使用。"
+                                                 "作为 http 代理使用：IconDownloader(proxies=..., endpoints=BENCHMARK_ENDPOINTS)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=50, help="每个响应的平均延迟（毫秒，默认 50）")
+    parser.add_argument('--jitter', type=float, default=20, help="延迟的随机浮动范围（毫秒，默认 20）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="返回 503 的比例（0~1，默认 0）")
+    parser.add_argument('--missing-rate', type=float, default=0.1, help="没有图标的域名比例（默认 0.1）")
+    parser.add_argument('--sizes', type=comma_sizes, default=DEFAULT_SIZES,
+                        help="图标尺寸，逗号分隔，每个域名从中选一个（默认 16,32,64,128,180,256）")
+    parser.add_argument('--down', type=comma_names, default=(),
+                        help=f"始终返回 503 的服务，逗号分隔（{','.join(SERVICE_HOSTS.values())}）")
+    args = parser.parse_args(argv)
+    config = BenchmarkConfig(args.latency, args.jitter, args.error_rate, args.sizes, args.missing_rate,
+                             down=args.down)
+    print(f"模拟服务已启动: http://{args.host}:{args.port}/")
+    try:
+        serve(config, host=args.host, port=args.port)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import time
+import random
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+# 各上游主机的请求速率 (每秒请求数, 突发数)，按域名后缀匹配，例如 bing.com 也适用于 www.bing.com
+DEFAULT_HOST_RATES = {
+    'bing.com': (5, 5),
+    'google.com': (10, 10),
+    'icons.duckduckgo.com': (10, 10),
+    'favicon.yandex.net': (10, 10),
+    'ico.kucat.cn': (2, 4),
+    'fanyi.baidu.com': (2, 2),
+    'fanyi.youdao.com': (2, 2),
+}
+# 未单独配置的主机（各个目标网站）
+DEFAULT_RATE = (8, 8)
+# 重试的退避时间（秒）：第 n 次重试前等待约 RETRY_BASE_DELAY × 2^(n-1)，最长 RETRY_MAX_DELAY
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 8.0
+
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """第 attempt 次重试（从 1 开始）前的等待秒数：指数退避，并在后一半范围内随机抖动，避免各线程同时重试"""
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class TokenBucket:
+    """令牌桶：平均每秒 rate 个请求，最多连续 burst 个"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """预定一个令牌，返回需要等待的秒数（令牌可以透支，等待的请求按预定顺序放行）"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class ConcurrencyLimiter:
+    """限制网络请求：全局并发上限 + 每个主机的并发上限 + 每个主机的令牌桶限速
+
+    不同主机的请求互不影响，各自以配置的速率全速发出；rates 覆盖 DEFAULT_HOST_RATES 中的值，
+    rate 为 None 的主机不限速。
+    """
+
+    def __init__(self, max_total=32, per_host=4, rates=None, default_rate=DEFAULT_RATE):
+        self.max_total = max_total
+        self.per_host = per_host
+        self.rates = dict(DEFAULT_HOST_RATES, **(rates or {}))
+        self.default_rate = default_rate
+        self._total = threading.BoundedSemaphore(max_total)
+        self._hosts = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def rate_for(self, host):
+        """按最长的域名后缀查找速率配置"""
+        parts = host.split('.')
+        for i in range(len(parts)):
+            suffix = '.'.join(parts[i:])
+            if suffix in self.rates:
+                return self.rates[suffix]
+        return self.default_rate
+
+    def set_rate(self, host, rate, burst=None):
+        """修改一个主机（及其子域名）的速率，rate 为 None 表示不限速"""
+        with self._lock:
+            self.rates[host] = (rate, burst) if rate else None
+            self._buckets = {}
+
+    def _bucket(self, host):
+        with self._lock:
+            if host not in self._buckets:
+                rate = self.rate_for(host)
+                self._buckets[host] = TokenBucket(*rate) if rate else None
+            return self._buckets[host]
+
+    def _host_semaphore(self, host):
+        with self._lock:
+            semaphore = self._hosts.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host)
+                self._hosts[host] = semaphore
+            return semaphore
+
+    @contextmanager
+    def slot(self, url):
+        """占用一个请求名额：先等主机名额和令牌，再等全局名额，避免等待时空占全局名额"""
+        host = (urlparse(url).hostname or '').lower()
+        host_semaphore = self._host_semaphore(host)
+        bucket = self._bucket(host)
+        with host_semaphore:
+            if bucket is not None:
+                bucket.acquire()
+            with self._total:
+                yield
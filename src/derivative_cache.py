@@ -0,0 +1,57 @@
+import os
+
+from lru import LRUCache
+
+
+class DerivativeCache:
+    """按尺寸缓存的派生图
+
+    原图以原始分辨率保存一次，某个尺寸第一次被请求时才生成对应的PNG，
+    存放在 {cache_dir}/{尺寸}/{哈希}.png。总大小超过 max_bytes 时按最近最少使用淘汰。
+    """
+
+    def __init__(self, cache_dir, source_path, render, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.source_path = source_path  # 哈希 → 原图路径
+        self.render = render            # (原图路径, 目标路径, 尺寸) → 写入字节数
+        self._lru = LRUCache(maxsize=1_000_000, max_weight=max_bytes,
+                             weigh=lambda nbytes: nbytes, on_evict=self._remove)
+        self._load_existing()
+
+    def _load_existing(self):
+        """把上次运行留下的派生图按修改时间登记进LRU"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        found = []
+        for size in os.listdir(self.cache_dir):
+            folder = os.path.join(self.cache_dir, size)
+            if not size.isdigit() or not os.path.isdir(folder):
+                continue
+            for filename in os.listdir(folder):
+                if filename.endswith('.png'):
+                    stat = os.stat(os.path.join(folder, filename))
+                    found.append((stat.st_mtime, (filename[:-4], int(size)), stat.st_size))
+        for _, key, nbytes in sorted(found):
+            self._lru.put(key, nbytes)
+
+    def path(self, digest, size):
+        return os.path.join(self.cache_dir, str(size), f"{digest}.png")
+
+    def _remove(self, key, nbytes):
+        try:
+            os.remove(self.path(*key))
+        except OSError:
+            pass
+
+    def get(self, digest, size):
+        """返回 size×size 派生图的路径，不存在时从原图生成"""
+        key = (digest, size)
+        path = self.path(digest, size)
+        if self._lru.get(key) is not None and os.path.exists(path):
+            return path
+        nbytes = self.render(self.source_path(digest), path, size)
+        self._lru.put(key, nbytes)
+        return path
+
+    def stats(self):
+        return self._lru.stats()
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class DomainCache:
+    """名称 → 域名 的持久化缓存（SQLite）
+
+    成功的解析结果保存 ttl 秒；解析失败的名称也会记录（domain 为 None），
+    保存 negative_ttl 秒，避免同一个找不到的名称每次都重新走一遍网络搜索。
+    """
+
+    def __init__(self, path, ttl=30 * 24 * 3600, negative_ttl=24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS domains ("
+                " key TEXT PRIMARY KEY,"
+                " name TEXT NOT NULL,"
+                " domain TEXT,"
+                " created REAL NOT NULL,"
+                " expires REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def normalize(name):
+        return name.strip().casefold()
+
+    def _row_to_entry(self, row):
+        name, domain, created, expires = row
+        return {'name': name, 'domain': domain, 'created': created, 'expires': expires}
+
+    def get(self, name):
+        """返回未过期的缓存条目，没有则返回None；条目的 domain 为 None 表示已知解析失败"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, domain, created, expires FROM domains WHERE key = ?",
+                (self.normalize(name),)
+            ).fetchone()
+        if row is None or row[3] < time.time():
+            return None
+        return self._row_to_entry(row)
+
+    def set(self, name, domain, ttl=None):
+        """写入解析结果，domain 为 None 时记为失败条目"""
+        if ttl is None:
+            ttl = self.ttl if domain else self.negative_ttl
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO domains (key, name, domain, created, expires) VALUES (?, ?, ?, ?, ?)",
+                (self.normalize(name), name.strip(), domain, now, now + ttl)
+            )
+
+    def invalidate(self, name=None):
+        """删除指定名称的缓存，name 为 None 时清空全部，返回删除的条数"""
+        with self._lock, self._conn:
+            if name is None:
+                cursor = self._conn.execute("DELETE FROM domains")
+            else:
+                cursor = self._conn.execute("DELETE FROM domains WHERE key = ?", (self.normalize(name),))
+            return cursor.rowcount
+
+    def purge_expired(self):
+        """删除所有已过期的条目，返回删除的条数"""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM domains WHERE expires < ?", (time.time(),)).rowcount
+
+    def entries(self, include_expired=False):
+        """列出缓存内容，便于检查"""
+        sql = "SELECT name, domain, created, expires FROM domains"
+        params = ()
+        if not include_expired:
+            sql += " WHERE expires >= ?"
+            params = (time.time(),)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY name", params).fetchall()
+        return [self._row_to_entry(row) for row in rows]
+
+    def stats(self):
+        """缓存条目统计：总数、成功、失败、已过期"""
+        now = time.time()
+        with self._lock:
+            total, positive, negative, expired = self._conn.execute(
+                "SELECT COUNT(*),"
+                " SUM(domain IS NOT NULL AND expires >= ?),"
+                " SUM(domain IS NULL AND expires >= ?),"
+                " SUM(expires < ?) FROM domains",
+                (now, now, now)
+            ).fetchone()
+        return {'total': total, 'positive': positive or 0, 'negative': negative or 0, 'expired': expired or 0}
+
+    def prewarm(self, mappings, ttl=None):
+        """用已知的 名称→域名 批量填充缓存"""
+        for name, domain in mappings.items():
+            self.set(name, domain, ttl)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,84 @@
+import re
+
+
+# 搜索结果中需要忽略的链接和域名
+EXCLUDED_URL = re.compile('|'.join(re.escape(pattern) for pattern in [
+    'bing.com', 'google.com', 'baidu.com/s?',
+    'advertisement', 'click', 'redirect',
+    'search?', 'microsoft.com', '.gov',
+    'wikipedia.org', 'zhihu.com/question'
+]))
+EXCLUDED_DOMAIN = re.compile('|'.join(re.escape(pattern) for pattern in [
+    'bing.com', 'google.com', 'baidu.com/s',
+    'advertisement', 'ad.', '.gov', 'search',
+    'wikipedia.org', 'zhihu.com/question'
+]))
+# 去掉协议和 www.，取到第一个 /、空白或 Bing 的 › 分隔符为止
+DOMAIN_PATTERN = re.compile(r'^\s*(?:https?://)?(?:www\.)?([^/\s›]+)')
+NAME_SEPARATORS = re.compile(r'[\s\-_]')
+DOMAIN_SEPARATORS = re.compile(r'[\s\-_\.]')
+VALID_TLDS = ('.com', '.cn', '.net', '.org', '.com.cn')
+TLD_SCORES = (('.com.cn', 4), ('.com', 3), ('.cn', 2), ('.net', 1))
+
+
+def is_valid_url(url):
+    """验证URL是否有效"""
+    return not EXCLUDED_URL.search(url.lower())
+
+
+def extract_domain(url):
+    """从URL中提取域名"""
+    match = DOMAIN_PATTERN.match(url.lower())
+    return match.group(1) if match else ''
+
+
+class DomainMatcher:
+    """针对一个品牌名称预先计算好比较所需的数据，逐个给搜索结果中的链接打分"""
+
+    def __init__(self, name, english_name=None):
+        self.name = name.lower()
+        self.english_name = (english_name or name).lower()
+        self.names = (self.name, self.english_name)
+        self.name_parts = set(NAME_SEPARATORS.split(self.name) + NAME_SEPARATORS.split(self.english_name))
+        self.exact = {f"{n}{tld}" for n in self.names for tld in ('.com', '.cn')}
+
+    def is_valid_domain(self, domain):
+        """验证域名是否有效：包含品牌名称（原名或英文名）且是常见顶级域名"""
+        domain = domain.lower()
+        if EXCLUDED_DOMAIN.search(domain):
+            return False
+        return bool(self.name_parts & set(DOMAIN_SEPARATORS.split(domain))) and domain.endswith(VALID_TLDS)
+
+    def is_exact(self, domain):
+        """是否完全匹配 name.com / name.cn，即可以确定是官网"""
+        return domain.lower() in self.exact
+
+    def score(self, domain):
+        """计算域名匹配得分"""
+        domain = domain.lower()
+        score = 0
+        # 域名完全匹配得分最高
+        if domain in self.exact:
+            score += 10
+        # 域名包含完整名称
+        if any(n in domain for n in self.names):
+            score += 5
+        # 域名包含名称的一部分
+        score += len(self.name_parts & set(DOMAIN_SEPARATORS.split(domain))) * 2
+        # 域名长度越短越可能是官网
+        score += 10.0 / len(domain)
+        # 优先选择常见顶级域名
+        for tld, tld_score in TLD_SCORES:
+            if domain.endswith(tld):
+                score += tld_score
+                break
+        return score
+
+    def candidate(self, url):
+        """从一个链接得到 (域名, 得分)，不是候选返回None"""
+        if not url or not is_valid_url(url):
+            return None
+        domain = extract_domain(url)
+        if not domain or not self.is_valid_domain(domain):
+            return None
+        return domain, self.score(domain)
@@ -0,0 +1,155 @@
+import re
+from bisect import bisect_left
+from collections import Counter, namedtuple
+
+from lazy_import import is_available, lazy_module
+from mapping_index import normalize
+
+# pypinyin 导入约需 0.3 秒，只有编译索引不可用、需要现场生成拼音键时才导入；没有安装时不生成拼音键
+pypinyin = lazy_module('pypinyin')
+
+
+Candidate = namedtuple('Candidate', ['key', 'domain', 'score'])
+
+# 键的来源：名称/别名、拼音全拼、域名主体可以直接采用；拼音首字母和其他附加键只作为建议
+NAME, PINYIN, INITIALS, LABEL, EXTRA = 'name', 'pinyin', 'initials', 'label', 'extra'
+ACCEPTED_KINDS = {NAME, PINYIN, LABEL}
+
+_CJK = re.compile(r'[\u4e00-\u9fff]')
+
+
+def pinyin_keys(name):
+    """中文名称的拼音键：全拼和首字母，如 支付宝 → zhifubao、zfb"""
+    if not _CJK.search(name) or not is_available(pypinyin):
+        return []
+    syllables = [s for s in pypinyin.lazy_pinyin(name) if s.strip()]
+    if not syllables:
+        return []
+    return [''.join(syllables).casefold(), ''.join(s[0] for s in syllables).casefold()]
+
+
+def domain_label(domain):
+    """域名的主体部分，如 alipay.com → alipay，weixin.qq.com → weixin"""
+    host = domain.split('/')[0].lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return host.split('.')[0]
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein 距离，超过 limit 时提前返回 limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _ngrams(text):
+    """二元组；单个字符时返回自身"""
+    if len(text) < 2:
+        return {text}
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class FuzzyIndex:
+    """品牌名称的模糊/前缀检索索引
+
+    键包括映射中的所有名称和别名、域名主体（alipay）以及中文名称的拼音
+    （zhifubao / zfb，需要 pypinyin，也可由编译好的索引直接提供）。
+    前缀查找用有序键表 + 二分，错别字用二元组倒排表筛出候选后再算编辑距离，
+    整个查询在进程内完成，不需要任何网络请求。
+    同一个键可能对应多个域名（tb 是淘宝、贴吧、听伴的首字母），每个键保留全部域名和键的来源。
+    """
+
+    def __init__(self, entries):
+        """entries 为 (键, 域名, 来源) 的序列，来源见 ACCEPTED_KINDS"""
+        self.domains = {}  # 键 → {域名}
+        self.kinds = {}    # 键 → {来源}
+        for key, domain, kind in entries:
+            key = normalize(key)
+            if key:
+                self.domains.setdefault(key, set()).add(domain)
+                self.kinds.setdefault(key, set()).add(kind)
+        self.keys = sorted(self.domains)
+        self.grams = {}
+        for key in self.keys:
+            for gram in _ngrams(key):
+                self.grams.setdefault(gram, []).append(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_mapping(cls, mapping_index, extra_keys=None):
+        """从 MappingIndex 构建；extra_keys 为额外的 {键: 域名}，只作为建议，不会直接采用"""
+        entries = [(name, domain, NAME) for name, domain in mapping_index.index.items()]
+        # 从编译索引加载时拼音键已预先算好，顺序同 pinyin_keys：全拼、首字母
+        precomputed = mapping_index.pinyin
+        for name, domain in mapping_index.index.items():
+            keys = precomputed.get(name, ()) if precomputed is not None else pinyin_keys(name)
+            for key, kind in zip(keys, (PINYIN, INITIALS)):
+                entries.append((key, domain, kind))
+        if extra_keys:
+            entries.extend((key, domain, EXTRA) for key, domain in extra_keys.items())
+        for domain in set(mapping_index.index.values()):
+            label = domain_label(domain)
+            if len(label) >= 3:
+                entries.append((label, domain, LABEL))
+        return cls(entries)
+
+    def _prefix_matches(self, query, limit):
+        start = bisect_left(self.keys, query)
+        matches = []
+        for key in self.keys[start:]:
+            if not key.startswith(query) or len(matches) >= limit:
+                break
+            matches.append(key)
+        return matches
+
+    def search(self, query, limit=5):
+        """返回按得分排序的候选列表（得分 0~1，1 表示完全匹配），一个键对应多个域名时每个域名一项"""
+        query = normalize(query)
+        if not query:
+            return []
+        scores = {}
+        if query in self.domains:
+            scores[query] = 1.0
+
+        # 前缀匹配：得分随覆盖比例升高
+        for key in self._prefix_matches(query, limit * 4):
+            scores.setdefault(key, 0.5 + 0.5 * len(query) / len(key))
+
+        # 错别字：共享二元组最多的候选再计算编辑距离
+        max_distance = max(1, len(query) // 4)
+        shared = Counter()
+        for gram in _ngrams(query):
+            shared.update(self.grams.get(gram, ()))
+        for key, _ in shared.most_common(limit * 8):
+            if key in scores:
+                continue
+            distance = edit_distance(query, key, max_distance)
+            if distance <= max_distance:
+                scores[key] = 1.0 - distance / max(len(query), len(key))
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(item[0]), item[0]))
+        candidates = [Candidate(key, domain, round(score, 3))
+                      for key, score in ranked for domain in sorted(self.domains[key])]
+        return candidates[:limit]
+
+    def best(self, query):
+        """可以直接采用的候选：查询与名称、拼音全拼或域名主体完全相同，且只对应一个域名；否则返回None
+
+        拼音首字母（tb 可能是淘宝、贴吧或听伴）、前缀和错别字匹配都不直接采用，只作为 search 的建议。
+        """
+        query = normalize(query)
+        domains = self.domains.get(query)
+        if domains and len(domains) == 1 and self.kinds[query] & ACCEPTED_KINDS:
+            return Candidate(query, next(iter(domains)), 1.0)
+        return None
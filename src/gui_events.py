@@ -0,0 +1,63 @@
+import queue
+
+
+class EventPump:
+    """工作线程向 Tk 主线程传递界面更新的通道
+
+    任意线程调用 post(类型, *参数) 入队；主线程每 interval 毫秒取出至多 max_batch 个事件，
+    调用 on() 注册的处理函数。连续的 'log' 事件合并为一次调用，避免逐行插入文本造成界面卡顿。
+    Tk 控件只在主线程中被访问。
+    """
+
+    def __init__(self, root, interval=50, max_batch=2000):
+        self.root = root
+        self.interval = interval
+        self.max_batch = max_batch
+        self.handlers = {}
+        self._queue = queue.SimpleQueue()
+        self._running = False
+
+    def on(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def post(self, kind, *args):
+        self._queue.put((kind, args))
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.root.after(self.interval, self._drain)
+
+    def stop(self):
+        self._running = False
+
+    def _drain(self):
+        if not self._running:
+            return
+        logs = []
+        try:
+            for _ in range(self.max_batch):
+                try:
+                    kind, args = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == 'log':
+                    logs.append(args[0])
+                    continue
+                if logs:
+                    self._dispatch('log', (''.join(logs),))
+                    logs = []
+                self._dispatch(kind, args)
+            if logs:
+                self._dispatch('log', (''.join(logs),))
+        finally:
+            self.root.after(self.interval, self._drain)
+
+    def _dispatch(self, kind, args):
+        handler = self.handlers.get(kind)
+        if handler is None:
+            return
+        try:
+            handler(*args)
+        except Exception as e:
+            print(f"界面事件 {kind} 处理失败: {str(e)}")
@@ -0,0 +1,93 @@
+import codecs
+from html.parser import HTMLParser
+
+
+# 首页和搜索结果页最多读取的字节数
+HEAD_MAX_BYTES = 512 * 1024
+SEARCH_MAX_BYTES = 1024 * 1024
+
+
+class StreamParser(HTMLParser):
+    """边读边解析的HTML解析器基类，子类在拿到足够信息后把 done 置为True"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.done = False
+
+
+class HeadLinkParser(StreamParser):
+    """收集 <head> 中所有 <link> 的属性，遇到 </head> 或 <body> 即结束"""
+
+    def __init__(self):
+        super().__init__()
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'link':
+            self.links.append({name: value or '' for name, value in attrs})
+        elif tag == 'body':
+            self.done = True
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self.done = True
+
+
+class CiteParser(StreamParser):
+    """收集搜索结果页中 <cite> 的文本和 <a> 的链接，拿到 max_results 条 cite 即结束"""
+
+    def __init__(self, max_results=10):
+        super().__init__()
+        self.max_results = max_results
+        self.cites = []
+        self.hrefs = []
+        self._cite_depth = 0
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'cite':
+            self._cite_depth += 1
+        elif tag == 'a':
+            href = dict(attrs).get('href')
+            if href:
+                self.hrefs.append(href)
+
+    def handle_endtag(self, tag):
+        if tag == 'cite' and self._cite_depth:
+            self._cite_depth -= 1
+            if not self._cite_depth:
+                self.cites.append(''.join(self._text).strip())
+                self._text = []
+                if len(self.cites) >= self.max_results:
+                    self.done = True
+
+    def handle_data(self, data):
+        if self._cite_depth:
+            self._text.append(data)
+
+
+def stream_parse(response, parser, max_bytes, should_abort=None):
+    """分块读取响应并喂给解析器，解析器完成、读满 max_bytes 或 should_abort() 返回True后关闭连接，返回解析器
+
+    response 需以 stream=True 发出。未声明编码时按UTF-8解码（链接和域名本身都是ASCII）。
+    """
+    encoding = response.encoding if 'charset' in response.headers.get('content-type', '').lower() else 'utf-8'
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    received = 0
+    try:
+        for chunk in response.iter_content(8192):
+            received += len(chunk)
+            parser.feed(decoder.decode(chunk))
+            if parser.done or received >= max_bytes or (should_abort is not None and should_abort()):
+                break
+        else:
+            parser.feed(decoder.decode(b'', final=True))
+    finally:
+        response.close()
+    return parser
@@ -0,0 +1,194 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from email.utils import parsedate_to_datetime
+
+
+class CachedResponse:
+    """缓存层返回的响应，提供与 requests.Response 相同的常用属性"""
+
+    def __init__(self, url, status_code, content, headers, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+
+def _freshness(headers, default_ttl):
+    """根据 Cache-Control / Expires 计算有效期（秒），None 表示不允许缓存"""
+    cache_control = headers.get('Cache-Control', '').lower()
+    if 'no-store' in cache_control:
+        return None
+    if 'no-cache' in cache_control:
+        return 0
+    match = re.search(r'max-age=(\d+)', cache_control)
+    if match:
+        return int(match.group(1))
+    expires = headers.get('Expires')
+    if expires:
+        try:
+            return max(0, parsedate_to_datetime(expires).timestamp() - time.time())
+        except Exception:
+            return 0
+    return default_ttl
+
+
+class HttpCache:
+    """图标服务请求的磁盘缓存
+
+    响应体按内容的 SHA-256 存放在 blobs/ 下，相同内容只存一份；
+    元数据（ETag、Last-Modified、过期时间）存在 SQLite 中。
+    新鲜的条目直接返回不访问网络，过期的条目带上校验头发条件请求，
+    服务器返回 304 时继续使用本地内容。
+    """
+
+    def __init__(self, cache_dir, default_ttl=24 * 3600):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, 'blobs')
+        self.default_ttl = default_ttl
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, 'http.sqlite3'), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " url TEXT PRIMARY KEY,"
+                " sha256 TEXT NOT NULL,"
+                " content_type TEXT,"
+                " etag TEXT,"
+                " last_modified TEXT,"
+                " stored REAL NOT NULL,"
+                " expires REAL NOT NULL)"
+            )
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _write_blob(self, content):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return digest
+
+    def _read_blob(self, digest):
+        try:
+            with open(self._blob_path(digest), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _entry(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, content_type, etag, last_modified, expires FROM responses WHERE url = ?",
+                (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('sha256', 'content_type', 'etag', 'last_modified', 'expires'), row))
+
+    def _store(self, url, response, digest=None):
+        ttl = _freshness(response.headers, self.default_ttl)
+        if ttl is None:
+            return
+        if digest is None:
+            digest = self._write_blob(response.content)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (url, sha256, content_type, etag, last_modified, stored, expires)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, digest, response.headers.get('Content-Type'), response.headers.get('ETag'),
+                 response.headers.get('Last-Modified'), now, now + ttl)
+            )
+
+    def _refresh(self, url, entry, headers):
+        """304 之后用新的响应头更新有效期和校验值"""
+        ttl = _freshness(headers, self.default_ttl)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE responses SET etag = ?, last_modified = ?, stored = ?, expires = ? WHERE url = ?",
+                (headers.get('ETag') or entry['etag'], headers.get('Last-Modified') or entry['last_modified'],
+                 now, now + (ttl or 0), url)
+            )
+
+    def _cached_response(self, url, entry, content):
+        return CachedResponse(url, 200, content, {'Content-Type': entry['content_type'] or ''}, from_cache=True)
+
+    def fetch(self, url, send):
+        """带缓存地获取 url
+
+        send(extra_headers) 负责真正发出请求并返回 requests.Response，
+        这样并发限制等逻辑仍由调用方控制。只有 200 响应会被缓存。
+        """
+        entry = self._entry(url)
+        content = self._read_blob(entry['sha256']) if entry else None
+        if content is not None and entry['expires'] > time.time():
+            self.hits += 1
+            return self._cached_response(url, entry, content)
+
+        extra_headers = {}
+        if content is not None:
+            if entry['etag']:
+                extra_headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                extra_headers['If-Modified-Since'] = entry['last_modified']
+
+        response = send(extra_headers)
+        if response.status_code == 304 and content is not None:
+            self.revalidated += 1
+            self._refresh(url, entry, response.headers)
+            return self._cached_response(url, entry, content)
+
+        self.misses += 1
+        if response.status_code == 200:
+            self._store(url, response)
+        return response
+
+    def invalidate(self, url=None):
+        """删除指定地址的缓存，url 为 None 时清空全部"""
+        with self._lock, self._conn:
+            if url is None:
+                self._conn.execute("DELETE FROM responses")
+            else:
+                self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+
+    def prune(self):
+        """删除不再被任何条目引用的内容文件，返回删除的个数"""
+        with self._lock:
+            referenced = {row[0] for row in self._conn.execute("SELECT sha256 FROM responses")}
+        removed = 0
+        for prefix in os.listdir(self.blob_dir):
+            folder = os.path.join(self.blob_dir, prefix)
+            for digest in os.listdir(folder):
+                if digest not in referenced and not digest.endswith('.tmp'):
+                    os.remove(os.path.join(folder, digest))
+                    removed += 1
+        return removed
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {'entries': entries, 'hits': self.hits, 'revalidated': self.revalidated, 'misses': self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
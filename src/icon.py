@@ -1,5 +1,6 @@
 from PIL import Image, ImageDraw, ImageFont
 import os
+from icon_export import size_ladder, save_ico
 
 def create_icon():
     # 创建一个512x512的图像，使用纯色背景
@@ -29,13 +30,9 @@ def create_icon():
     # 绘制白色文字
     draw.text((text_x, text_y), text, fill='white', font=font)
     
-    # 保存ICO文件
-    icon_sizes = [(16, 16), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
-    icons = []
-    for s in icon_sizes:
-        icons.append(image.resize(s, Image.Resampling.LANCZOS))
-    
-    icons[0].save("icon.ico", format='ICO', sizes=icon_sizes)
+    # 保存ICO文件：从512逐级缩小生成各帧，所有帧写入同一个ICO
+    icon_sizes = [16, 32, 48, 64, 128, 256]
+    save_ico(size_ladder(image, icon_sizes), "icon.ico")
     print("图标文件已生成完成！")
 
 if __name__ == "__main__":
@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import argparse
+import contextlib
+import multiprocessing
+
+from icon_downloader import IconDownloader
+from job_journal import JournalMismatch
+
+
+# 命令行中的服务简称 → get_icon_services 中的服务名
+SERVICE_ALIASES = {
+    'google': 'Google Favicon',
+    'duckduckgo': 'DuckDuckGo',
+    'yandex': 'Yandex',
+    'kucat': 'ico.kucat.cn',
+    'direct': 'direct',
+}
+EXPORT_FORMATS = ('ico', 'png', 'webp')
+
+
+def comma_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def parse_services(value):
+    services = []
+    for alias in comma_list(value):
+        if alias.lower() not in SERVICE_ALIASES:
+            raise argparse.ArgumentTypeError(f"未知的服务: {alias}（可选: {', '.join(SERVICE_ALIASES)}）")
+        services.append(SERVICE_ALIASES[alias.lower()])
+    return services
+
+
+def parse_sizes(value):
+    try:
+        return tuple(int(size) for size in comma_list(value))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"尺寸必须是整数列表: {value}")
+
+
+def parse_formats(value):
+    formats = [fmt.lower() for fmt in comma_list(value)]
+    unknown = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"未知的导出格式: {', '.join(unknown)}（可选: {', '.join(EXPORT_FORMATS)}）")
+    return formats
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="批量下载图标（无界面）。从文件或标准输入读取名称/域名（每行一个），"
+                    "每处理完一个就向输出写一行JSON，其中 line 为该名称在输入中的行号（从 1 开始，重复的名称只处理第一次出现的）。")
+    parser.add_argument('input', nargs='?', default='-',
+                        help="名称列表文件，每行一个，# 开头的行忽略；省略或 - 表示标准输入")
+    parser.add_argument('-o', '--output', default='-',
+                        help="JSONL 结果输出文件，默认标准输出")
+    parser.add_argument('-d', '--output-dir',
+                        help="图标保存目录，默认 src/downloaded_icons")
+    parser.add_argument('-j', '--workers', type=int, default=8,
+                        help="同时处理的名称数（默认 8）")
+    parser.add_argument('--connections', type=int, default=32,
+                        help="全局最大并发请求数（默认 32）")
+    parser.add_argument('--per-host', type=int, default=4,
+                        help="单个主机最大并发请求数（默认 4）")
+    parser.add_argument('--services', type=parse_services,
+                        help=f"启用的图标来源，逗号分隔（{','.join(SERVICE_ALIASES)}），默认全部")
+    parser.add_argument('-s', '--size', type=int, default=256,
+                        help="图标尺寸（默认 256）")
+    parser.add_argument('--native', action='store_true',
+                        help="按原始分辨率保存，不缩放")
+    parser.add_argument('--strategy', choices=('all', 'best', 'hedged'), default='all',
+                        help="all: 请求所有来源；best: 按历史表现分批请求，够大就停止；"
+                             "hedged: 先请求最快的服务，稍等没有结果再请求下一个（适合单个名称）")
+    parser.add_argument('--export', type=parse_formats, metavar='FORMATS',
+                        help=f"下载后导出图标集，逗号分隔的格式（{','.join(EXPORT_FORMATS)}）")
+    parser.add_argument('--export-sizes', type=parse_sizes, metavar='SIZES',
+                        help="导出图标集的尺寸，逗号分隔，默认 16,24,32,48,64,128,256,512（需要 --export）")
+    parser.add_argument('--journal',
+                        help="作业日志（JSONL）路径，记录进度以便中断后续传")
+    parser.add_argument('--resume', action='store_true',
+                        help="从 --journal 续传，跳过已完成的名称")
+    parser.add_argument('--fresh', action='store_true',
+                        help="清空已有的 --journal 重新开始（不指定 --resume 或 --fresh 时拒绝覆盖已有进度）")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="结束后写出各阶段耗时和各服务计数：.prom/.txt 为 Prometheus 文本格式，其余为 JSON")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="不输出过程日志（默认输出到标准错误）")
+    return parser
+
+
+def read_names(source):
+    """逐行读取名称，去掉空行、注释和重复项，保持原顺序
+
+    返回 (名称列表, 各名称所在的行号列表)，重复的名称取第一次出现的行号。
+    """
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, 'r', encoding='utf-8-sig') as f:
+            lines = f.read().splitlines()
+    first_lines = {}
+    for number, line in enumerate(lines, 1):
+        name = line.strip()
+        if name and not name.startswith('#'):
+            first_lines.setdefault(name, number)
+    return list(first_lines), list(first_lines.values())
+
+
+def open_output(target):
+    if target == '-':
+        if hasattr(sys.stdout, 'reconfigure'):
+            sys.stdout.reconfigure(encoding='utf-8')
+        return contextlib.nullcontext(sys.stdout)
+    return open(target, 'w', encoding='utf-8')
+
+
+def run(args):
+    if (args.resume or args.fresh) and not args.journal:
+        raise SystemExit("--resume / --fresh 需要同时指定 --journal")
+    if args.resume and args.fresh:
+        raise SystemExit("--resume 和 --fresh 不能同时使用")
+    if args.journal and not (args.resume or args.fresh) and os.path.exists(args.journal) \
+            and os.path.getsize(args.journal) > 0:
+        raise SystemExit(f"作业日志 {args.journal} 中已有进度：加 --resume 续传，或加 --fresh 清空后重新开始")
+    names, line_numbers = read_names(args.input)
+
+    # 标准输出只留给 JSONL 结果，下载过程中的日志改到标准错误
+    log = open(os.devnull, 'w') if args.quiet else sys.stderr
+    failed = 0
+    with open_output(args.output) as out, contextlib.redirect_stdout(log):
+        downloader = IconDownloader(max_workers=args.workers,
+                                    max_connections=args.connections,
+                                    per_host_limit=args.per_host,
+                                    storage_mode='native' if args.native else 'eager',
+                                    output_dir=args.output_dir,
+                                    services=args.services)
+        if args.export_sizes:
+            downloader.export_sizes = args.export_sizes
+        try:
+            results = downloader.iter_download_icons(names, args.size, args.export, args.strategy,
+                                                     args.journal, args.resume, args.metrics)
+            for i, result in results:
+                if result.get('error') or not result.get('icons'):
+                    failed += 1
+                out.write(json.dumps(dict(result, line=line_numbers[i]), ensure_ascii=False) + '\n')
+                out.flush()
+        except JournalMismatch as e:
+            raise SystemExit(f"{e}\n请换一个 --journal 文件，或改用 --fresh 清空后重新开始")
+        finally:
+            downloader.image_pipeline.shutdown()
+    if not args.quiet:
+        print(f"完成 {len(names)} 个，其中 {failed} 个没有下载到图标", file=sys.stderr)
+        if args.metrics:
+            print(downloader.metrics.report(), file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    multiprocessing.freeze_support()
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.export_sizes and not args.export:
+        parser.error("--export-sizes 需要同时指定 --export")
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,56 +1,232 @@
 import os
-import requests
-from bs4 import BeautifulSoup
-from PIL import Image
-from io import BytesIO
-from tqdm import tqdm
 import re
 import json
 import time
-from urllib.parse import quote
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from urllib.parse import quote, urlparse
+from lazy_import import lazy_module
+from concurrency import ConcurrencyLimiter
+from domain_cache import DomainCache
+from domain_matcher import DomainMatcher, extract_domain, is_valid_url
+from http_cache import HttpCache
+from icon_store import IconStore
+from image_pipeline import ImagePipeline, header_size
+from derivative_cache import DerivativeCache
+from icon_export import DEFAULT_SIZES
+from html_stream import HEAD_MAX_BYTES, SEARCH_MAX_BYTES, CiteParser, HeadLinkParser, stream_parse
+from job_journal import JobJournal
+from metrics import Metrics
+from service_health import CircuitOpen, HealthTracker
+from icon_planner import ServiceHistory, convention_candidates, link_candidates, manifest_candidates, plan
+from mapping_index import MappingIndex, find_resource, resource_dirs
+from fuzzy_index import FuzzyIndex
+
+# requests 和 tqdm 导入较慢，第一次发请求/显示进度条时才导入
+requests = lazy_module('requests')
+tqdm = lazy_module('tqdm')
+
+# 图标探测时先读取的字节数，足够覆盖 PNG/ICO/GIF/JPEG 的文件头
+PROBE_BYTES = 16 * 1024
+# 单个图标的最大字节数，超过视为异常响应
+MAX_ICON_BYTES = 2 * 1024 * 1024
+
+
+# 直接从网站下载的结果在服务列表中的名称
+DIRECT_SERVICE = '直接下载'
+
+# 外部接口的地址模板，可用 IconDownloader(endpoints=...) 覆盖，例如基准测试时指向本地的模拟服务
+DEFAULT_ENDPOINTS = {
+    'Google Favicon': 'https://www.google.com/s2/favicons?domain={domain}&sz={size}',
+    'DuckDuckGo': 'https://icons.duckduckgo.com/ip3/{domain}.ico',
+    'Yandex': 'https://favicon.yandex.net/favicon/{domain}',
+    'ico.kucat.cn': 'https://ico.kucat.cn/get.php?url={domain}',
+    'bing': 'https://www.bing.com/search?q={query}',
+    'baidu_translate': 'https://fanyi.baidu.com/sug',
+    'youdao_translate': 'http://fanyi.youdao.com/translate?&doctype=json&type=AUTO&i={text}',
+    # 直接下载时同时请求的首页地址
+    'homepages': ('https://{domain}', 'https://www.{domain}', 'http://{domain}', 'http://www.{domain}'),
+}
+# get_icon_services 返回的在线图标服务（按服务健康状况排序）
+ICON_SERVICES = ('Google Favicon', 'DuckDuckGo', 'Yandex', 'ico.kucat.cn')
+# 对冲请求：等待多久（秒）没有结果就请求下一个服务。有记录时取该服务平均耗时的 HEDGE_FACTOR 倍，
+# 限制在 HEDGE_MIN_DELAY~HEDGE_MAX_DELAY 之间；没有记录时用 HEDGE_DELAY
+HEDGE_DELAY = 0.5
+HEDGE_FACTOR = 1.5
+HEDGE_MIN_DELAY = 0.1
+HEDGE_MAX_DELAY = 2.0
+
+
+class RequestAborted(Exception):
+    """请求在发出前被取消"""
+
+
+def unavailable_status(status_code):
+    """服务本身不可用的状态码（5xx、429），与“没有这个图标”（404 等）区分"""
+    return status_code >= 500 or status_code == 429
+
+
+def origin_of(url):
+    """协议+主机+端口，用来标记不可用的站点"""
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def range_complete(response, received):
+    """判断206响应是否已经包含了完整文件"""
+    content_range = response.headers.get('Content-Range', '')
+    total = content_range.rpartition('/')[2]
+    if total.isdigit():
+        return int(total) <= received
+    return received < PROBE_BYTES
 
 class IconDownloader:
-    def __init__(self):
+    def __init__(self, max_workers=8, max_connections=32, per_host_limit=4, storage_mode='eager', host_rates=None,
+                 output_dir=None, services=None, cache_dir=None, endpoints=None, proxies=None):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
         # 设置输出目录
-        self.output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'downloaded_icons')
+        self.output_dir = output_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'downloaded_icons')
         os.makedirs(self.output_dir, exist_ok=True)
+        # 保存时按像素去重，重复的图标只写一份
+        self.icon_store = IconStore(self.output_dir)
+        # 解码/缩放/编码在进程池中进行，不占用下载线程
+        self.image_pipeline = ImagePipeline()
+        # 'eager'：保存时直接缩放到请求的尺寸；'native'：按原始分辨率保存，
+        # 需要某个尺寸时再由派生图缓存按需生成
+        self.storage_mode = storage_mode
+        # 导出图标集时生成的尺寸
+        self.export_sizes = DEFAULT_SIZES
+        self.derivatives = DerivativeCache(os.path.join(self.output_dir, '.derivatives'),
+                                           self.icon_store.blob_path, self.image_pipeline.derive)
         
+        # 启用的图标来源（get_icon_services 中的服务名，'direct' 表示直接从网站下载），None 表示全部
+        self.services = set(services) if services else None
+        # 外部接口地址模板，见 DEFAULT_ENDPOINTS
+        self.endpoints = dict(DEFAULT_ENDPOINTS, **(endpoints or {}))
+
         # 加载域名映射
         self.domain_mappings = self.load_domain_mappings()
 
-    def load_domain_mappings(self):
-        """加载域名映射，优先使用外部文件"""
-        # 首先尝试从程序目录加载
-        exe_dir = os.path.dirname(os.path.abspath(__file__))
-        external_json = os.path.join(exe_dir, 'domain_mappings.json')
-        
-        if os.path.exists(external_json):
+        # 域名解析缓存，跨进程保留搜索结果（包括搜索失败的名称）
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+        self.domain_cache = DomainCache(os.path.join(self.cache_dir, 'domains.sqlite3'))
+        # 图标服务响应缓存，重复运行时只发条件请求或完全不访问网络
+        self.http_cache = HttpCache(os.path.join(self.cache_dir, 'http'))
+        # 各图标服务的历史表现，用于 strategy='best' 时决定请求顺序
+        self.service_history = ServiceHistory(os.path.join(self.cache_dir, 'service_history.json'))
+        # 各图标服务当前的耗时、成功率和断路器，服务不可用时跳过它，并把快而可靠的服务排在前面
+        self.health = HealthTracker()
+        # 各阶段耗时和各服务计数，批量下载结束时可导出（见 metrics.Metrics）
+        self.metrics = Metrics()
+
+        # 并发设置：max_workers 个名称同时处理，所有请求共享全局和单主机并发上限
+        self.max_workers = max_workers
+        # host_rates: {主机: (每秒请求数, 突发数)}，覆盖 concurrency.DEFAULT_HOST_RATES
+        self.limiter = ConcurrencyLimiter(max_total=max_connections, per_host=per_host_limit, rates=host_rates)
+        self.max_connections = max_connections
+        # proxies: 所有请求经过的代理（{'http': ..., 'https': ...}），指定时不再读取环境变量中的代理设置
+        self.proxies = proxies
+        self._session = None
+        self._session_lock = threading.Lock()
+        # 单个名称内部的服务请求在这个线程池中并行执行
+        self.io_pool = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix='icon-io')
+
+    @property
+    def session(self):
+        """共享的 requests 会话，第一次发请求时才创建"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(pool_connections=self.max_connections,
+                                                            pool_maxsize=self.max_connections)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    if self.proxies:
+                        session.trust_env = False
+                        session.proxies.update(self.proxies)
+                    self._session = session
+        return self._session
+
+    def http_request(self, method, url, timeout=10, abort=None, **kwargs):
+        """所有出站请求的统一入口，受全局和单主机并发限制
+
+        abort 是可选的回调，排队拿到名额后若返回True则不再发出请求。
+        """
+        kwargs.setdefault('headers', self.headers)
+        with self.limiter.slot(url):
+            if abort is not None and abort():
+                raise RequestAborted(url)
+            return self.session.request(method, url, timeout=timeout, **kwargs)
+
+    def http_get(self, url, timeout=10, **kwargs):
+        return self.http_request('GET', url, timeout=timeout, **kwargs)
+
+    def service_get(self, service_name, url, timeout=10, cached=True, abort=None, retry=False):
+        """向图标服务发GET请求（cached 时经过磁盘缓存），经过该服务的断路器并计入健康统计
+
+        断路器只管真正发出的请求：缓存直接提供的响应不占用半开状态的试探名额，也不计入统计。
+        断路器断开时不发请求，抛出 CircuitOpen。连接失败、超时、5xx 和 429 算失败，
+        其他响应（包括 404 和 304）算成功。
+        retry=True 表示同一个名称的重试：失败不再计入，一个名称的几次重试不会单独让断路器断开。
+        """
+        def send(extra_headers=None):
+            if not self.health.allow(service_name):
+                raise CircuitOpen(service_name)
+            headers = dict(self.headers, **extra_headers) if extra_headers else self.headers
+            start = time.perf_counter()
             try:
-                with open(external_json, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Warning: Failed to load external domain_mappings.json: {e}")
-        
-        # 如果外部文件不存在或加载失败，使用打包的资源
-        try:
-            import sys
-            if getattr(sys, 'frozen', False):
-                # 如果是打包后的程序
-                base_path = sys._MEIPASS
-            else:
-                # 如果是开发环境
-                base_path = os.path.dirname(os.path.abspath(__file__))
-            
-            internal_json = os.path.join(base_path, 'domain_mappings.json')
-            with open(internal_json, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error: Failed to load internal domain_mappings.json: {e}")
-            return {}  # 返回空字典作为后备
+                response = self.http_get(url, timeout=timeout, abort=abort, headers=headers)
+            except requests.exceptions.RequestException:
+                if not retry:
+                    self.health.record(service_name, False, time.perf_counter() - start)
+                raise
+            ok = not unavailable_status(response.status_code)
+            if ok or not retry:
+                self.health.record(service_name, ok, time.perf_counter() - start)
+            return response
+
+        if cached:
+            return self.http_cache.fetch(url, send)
+        return send()
+
+    def load_domain_mappings(self):
+        """加载所有域名映射并建立别名索引，优先使用外部文件"""
+        self.mapping_index = MappingIndex.load()
+        # 新增映射写入的文件：已有的 domain_mappings.json，否则放在程序目录
+        self.mappings_file = find_resource('domain_mappings.json') or os.path.join(resource_dirs()[0], 'domain_mappings.json')
+        self.mappings_dir = find_resource('domain_mappings') or os.path.join(resource_dirs()[0], 'domain_mappings')
+        self.brand_domains = self.mapping_index.mappings
+        self.fuzzy_index = FuzzyIndex.from_mapping(self.mapping_index)
+        print(f"已加载 {len(self.mapping_index)} 个名称/别名映射")
+        return self.brand_domains
+
+    def lookup_mapping(self, name, fuzzy=True):
+        """在别名索引中查找域名（不区分大小写），找不到返回None
+
+        精确匹配失败时再查模糊索引，只直接采用只对应一个域名的拼音全拼或域名主体（zhifubao、alipay）；
+        拼音首字母、前缀和错别字匹配可能指向别的品牌，只用于 suggest_names。
+        """
+        domain = self.mapping_index.lookup(name)
+        if domain or not fuzzy:
+            return domain
+        candidate = self.fuzzy_index.best(name)
+        if candidate:
+            print(f"模糊匹配: {name} → {candidate.key} ({candidate.domain})")
+            return candidate.domain
+        suggestions = self.fuzzy_index.search(name, 3)
+        if suggestions:
+            detail = '，'.join(f"{c.key} ({c.domain})" for c in suggestions)
+            print(f"{name} 没有完全匹配的映射，可能是: {detail}")
+        return None
+
+    def suggest_names(self, name, limit=5):
+        """返回模糊匹配的候选列表 [(名称, 域名, 得分)]"""
+        return self.fuzzy_index.search(name, limit)
 
     def create_default_mappings(self):
         """创建默认的域名映射文件"""
@@ -101,219 +277,175 @@ class IconDownloader:
             json.dump(mappings, f, ensure_ascii=False, indent=4)
             
         # 更新内存中的映射
-        self.brand_domains[name] = domain
+        self.mapping_index.add(name, domain, override=True)
+        self.fuzzy_index = FuzzyIndex.from_mapping(self.mapping_index)
         print(f"已添加映射: {name} -> {domain}")
 
     def get_all_categories(self):
         """获取所有可用的类别"""
-        categories = []
-        for filename in os.listdir(self.mappings_dir):
-            if filename.endswith('.json'):
-                categories.append(filename[:-5])
-        return categories
+        return sorted(set(self.mapping_index.categories.values()))
 
     def translate_to_english(self, text):
         """将中文翻译为英文"""
-        try:
-            # 使用百度翻译API
-            url = f"https://fanyi.baidu.com/sug"
-            data = {
-                "kw": text
-            }
-            response = requests.post(url, data=data, headers=self.headers, timeout=5)
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('data') and len(result['data']) > 0:
-                    return result['data'][0]['v'].split(';')[0].strip().lower()
+        with self.metrics.span('translate'):
+            try:
+                # 使用百度翻译API
+                url = self.endpoints['baidu_translate']
+                data = {
+                    "kw": text
+                }
+                response = self.http_request('POST', url, data=data, timeout=5)
+                if response.status_code == 200:
+                    result = response.json()
+                    if result.get('data') and len(result['data']) > 0:
+                        return result['data'][0]['v'].split(';')[0].strip().lower()
             
-            # 备用：使用有道翻译API
-            url = f"http://fanyi.youdao.com/translate?&doctype=json&type=AUTO&i={quote(text)}"
-            response = requests.get(url, headers=self.headers, timeout=5)
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('translateResult') and len(result['translateResult']) > 0:
-                    return result['translateResult'][0][0]['tgt'].lower()
+                # 备用：使用有道翻译API
+                url = self.endpoints['youdao_translate'].format(text=quote(text))
+                response = self.http_get(url, timeout=5)
+                if response.status_code == 200:
+                    result = response.json()
+                    if result.get('translateResult') and len(result['translateResult']) > 0:
+                        return result['translateResult'][0][0]['tgt'].lower()
             
-            return text
-        except Exception as e:
-            print(f"Translation error: {str(e)}")
-            return text
+                return text
+            except Exception as e:
+                print(f"Translation error: {str(e)}")
+                return text
 
     def search_domain(self, name):
         """通过搜索引擎查找品牌官网"""
         try:
-            # 首先检查已加载的域名映射
-            print(f"正在检查域名映射... 当前已加载 {len(self.brand_domains)} 个映射")
-            
-            # 转换为小写进行匹配
-            name_lower = name.lower()
-            for key, value in self.brand_domains.items():
-                if key.lower() == name_lower:
-                    print(f"在映射中找到域名: {value}")
-                    return value
-            
-            print(f"在映射中未找到域名: {name}")
-            print(f"已加载的映射: {self.brand_domains}")
-            
-            # 常见中国网站的直接映射
-            common_cn_sites = {
-                "支付宝": "alipay.com",
-                "百度": "baidu.com",
-                "淘宝": "taobao.com",
-                "京东": "jd.com",
-                "微信": "weixin.qq.com",
-                "微博": "weibo.com",
-                "知乎": "zhihu.com",
-                "抖音": "douyin.com",
-                "哔哩哔哩": "bilibili.com",
-                "网易": "163.com",
-                "阿里巴巴": "alibaba.com",
-                "腾讯": "qq.com",
-                "谷歌": "google.com",
-                "google": "google.com"
-            }
-            
-            # 检查是否是常见网站（不区分大小写）
-            for key, value in common_cn_sites.items():
-                if key.lower() == name_lower:
-                    return value
-            
-            # 如果是中文，先尝试翻译
-            if re.search(r'[\u4e00-\u9fff]', name):
-                english_name = self.translate_to_english(name)
-            else:
-                english_name = name
-                
-            # 构建多个搜索查询
-            search_queries = [
-                f"{name} 官网",
-                f"{name} official website",
-                f"{english_name} official website",
-                f"{name} site:.com OR site:.cn",
-                f"{english_name} site:.com OR site:.cn"
-            ]
-            
-            all_results = []
-            for query in search_queries:
-                # 使用Bing搜索
-                search_url = f"https://www.bing.com/search?q={quote(query)}"
-                response = requests.get(search_url, headers=self.headers, timeout=10)
-                
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # 查找搜索结果中的链接
-                    for cite in soup.find_all('cite'):
-                        url = cite.get_text()
-                        if url and self.is_valid_url(url):
-                            try:
-                                domain = self.extract_domain(url)
-                                if domain and self.is_valid_domain(domain, name, english_name):
-                                    all_results.append((domain, self.calculate_domain_score(domain, name, english_name)))
-                            except:
-                                continue
-                    
-                    # 如果没有找到结果，尝试其他链接
-                    if not all_results:
-                        for link in soup.find_all('a'):
-                            href = link.get('href', '')
-                            if href and self.is_valid_url(href):
-                                try:
-                                    domain = self.extract_domain(href)
-                                    if domain and self.is_valid_domain(domain, name, english_name):
-                                        all_results.append((domain, self.calculate_domain_score(domain, name, english_name)))
-                                except:
-                                    continue
-                
-                time.sleep(1)  # 添加延时避免请求过快
-            
-            # 选择得分最高的域名
-            if all_results:
-                all_results.sort(key=lambda x: x[1], reverse=True)
-                return all_results[0][0]
-            
-            return None
+            with self.metrics.span('resolve'):
+                return self._search_domain(name)
         except Exception as e:
             print(f"Error searching domain for {name}: {str(e)}")
             return None
 
+    def _search_domain(self, name):
+        """search_domain 的实现，网络错误直接抛出，以便调用方区分“找不到”和“查不了”"""
+        # 首先检查域名映射（别名索引，不区分大小写）
+        domain = self.lookup_mapping(name)
+        if domain:
+            print(f"在映射中找到域名: {domain}")
+            return domain
+        
+        print(f"在映射中未找到域名: {name}")
+        
+        # 中文名称的翻译和不依赖翻译的查询同时进行，翻译返回后再补发英文查询
+        translation = None
+        if re.search(r'[\u4e00-\u9fff]', name):
+            translation = self.io_pool.submit(self.translate_to_english, name)
+        search_queries = [
+            f"{name} 官网",
+            f"{name} official website",
+            f"{name} site:.com OR site:.cn"
+        ]
+
+        stop = threading.Event()
+        matcher = DomainMatcher(name)
+        pages = []
+        answered = 0
+        pending = {self.io_pool.submit(self.search_bing, query, stop.is_set) for query in search_queries}
+        if translation:
+            pending.add(translation)
+        best = None
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future is translation:
+                        english_name = future.result()
+                        matcher = DomainMatcher(name, english_name)
+                        if english_name != name.lower():
+                            pending |= {self.io_pool.submit(self.search_bing, query, stop.is_set) for query in (
+                                f"{english_name} official website",
+                                f"{english_name} site:.com OR site:.cn"
+                            )}
+                        continue
+                    try:
+                        page = future.result()
+                    except Exception as e:
+                        print(f"搜索请求失败: {str(e)}")
+                        continue
+                    if page is not None:
+                        answered += 1
+                        pages.append(page)
+                best = self.best_search_result(matcher, pages)
+                # 已有完全匹配 name.com / name.cn 的结果，不再等待其余查询
+                # （support.apple.com 之类的子域名得分也不低，不能据此提前结束）
+                if best and matcher.is_exact(best[0]):
+                    break
+        finally:
+            stop.set()
+            for future in pending:
+                future.cancel()
+
+        if best:
+            return best[0]
+        if not answered:
+            raise RuntimeError("搜索引擎没有返回任何结果页")
+        return None
+
+    def search_bing(self, query, should_abort):
+        """请求一页Bing搜索结果，返回解析出的 CiteParser，非200返回None"""
+        search_url = self.endpoints['bing'].format(query=quote(query))
+        with self.metrics.span('search', 'bing'):
+            try:
+                response = self.http_get(search_url, timeout=10, stream=True, abort=should_abort)
+            except requests.exceptions.Timeout:
+                self.metrics.count('timeouts', 'bing')
+                raise
+            if response.status_code != 200:
+                response.close()
+                self.metrics.count('misses', 'bing')
+                return None
+            # 只读取到足够的 <cite> 结果为止
+            page = stream_parse(response, CiteParser(), SEARCH_MAX_BYTES, should_abort)
+            self.metrics.count('hits' if page.cites else 'misses', 'bing')
+            return page
+
+    def best_search_result(self, matcher, pages):
+        """从已返回的搜索结果页中选出得分最高的 (域名, 得分)
+
+        优先使用 <cite> 中的网址，一页中没有可用的 cite 时再看该页其他链接。
+        """
+        best = None
+        for page in pages:
+            candidates = [c for c in map(matcher.candidate, page.cites) if c]
+            if not candidates:
+                candidates = [c for c in map(matcher.candidate, page.hrefs) if c]
+            for candidate in candidates:
+                if best is None or candidate[1] > best[1]:
+                    best = candidate
+        return best
+
     def is_valid_url(self, url):
         """验证URL是否有效"""
-        excluded_patterns = [
-            'bing.com', 'google.com', 'baidu.com/s?', 
-            'advertisement', 'click', 'redirect',
-            'search?', 'microsoft.com', '.gov', 
-            'wikipedia.org', 'zhihu.com/question'
-        ]
-        return not any(pattern in url.lower() for pattern in excluded_patterns)
+        return is_valid_url(url)
 
     def extract_domain(self, url):
         """从URL中提取域名"""
-        url = url.lower().strip()
-        url = url.replace('https://', '').replace('http://', '').replace('www.', '')
-        return url.split('/')[0]
+        return extract_domain(url)
 
     def is_valid_domain(self, domain, name, english_name):
         """验证域名是否有效"""
-        domain_lower = domain.lower()
-        name_lower = name.lower()
-        english_name_lower = english_name.lower()
-        
-        # 排除无效域名
-        excluded_domains = [
-            'bing.com', 'google.com', 'baidu.com/s', 
-            'advertisement', 'ad.', '.gov', 'search',
-            'wikipedia.org', 'zhihu.com/question'
-        ]
-        if any(x in domain_lower for x in excluded_domains):
-            return False
-            
-        # 检查域名是否包含品牌名称（原名或英文名）
-        name_parts = set(re.split(r'[\s\-_]', name_lower) + re.split(r'[\s\-_]', english_name_lower))
-        domain_parts = set(re.split(r'[\s\-_\.]', domain_lower))
-        
-        # 允许的顶级域名
-        valid_tlds = ('.com', '.cn', '.net', '.org', '.com.cn')
-        return bool(name_parts & domain_parts) and any(domain_lower.endswith(tld) for tld in valid_tlds)
+        return DomainMatcher(name, english_name).is_valid_domain(domain)
 
     def calculate_domain_score(self, domain, name, english_name):
         """计算域名匹配得分"""
-        score = 0
-        domain_lower = domain.lower()
-        name_lower = name.lower()
-        english_name_lower = english_name.lower()
-        
-        # 域名完全匹配得分最高
-        if domain_lower in [f"{name_lower}.com", f"{name_lower}.cn", f"{english_name_lower}.com", f"{english_name_lower}.cn"]:
-            score += 10
-        
-        # 域名包含完整名称
-        if name_lower in domain_lower or english_name_lower in domain_lower:
-            score += 5
-            
-        # 域名包含名称的一部分
-        name_parts = set(re.split(r'[\s\-_]', name_lower) + re.split(r'[\s\-_]', english_name_lower))
-        domain_parts = set(re.split(r'[\s\-_\.]', domain_lower))
-        matching_parts = name_parts & domain_parts
-        score += len(matching_parts) * 2
-        
-        # 域名长度越短越可能是官网
-        score += 10.0 / len(domain)
-        
-        # 优先选择常见顶级域名
-        if domain_lower.endswith('.com.cn'):
-            score += 4
-        elif domain_lower.endswith('.com'):
-            score += 3
-        elif domain_lower.endswith('.cn'):
-            score += 2
-        elif domain_lower.endswith('.net'):
-            score += 1
-            
-        return score
+        return DomainMatcher(name, english_name).score(domain)
 
     def get_domain_from_name(self, name):
-        """从品牌名称获取域名"""
+        """从品牌名称获取域名，找不到或网络出错时返回None"""
+        try:
+            return self.resolve_domain(name)
+        except Exception as e:
+            print(f"Error searching domain for {name}: {str(e)}")
+            return None
+
+    def resolve_domain(self, name):
+        """同 get_domain_from_name，但搜索时的网络错误直接抛出，以便调用方区分“找不到”和“查不了”"""
         name = name.strip()
         
         # 如果输入的是域名格式，直接返回
@@ -322,274 +454,669 @@ class IconDownloader:
                 name = name.replace('https://', '').replace('http://', '')
             return name.split('/')[0]
         
-        # 通过搜索引擎查找域名
-        domain = self.search_domain(name)
+        # 映射中有的名称直接返回，不经过缓存
+        domain = self.lookup_mapping(name)
+        if domain:
+            return domain
+
+        # 再查解析缓存，命中（包括已知失败）就不再访问网络
+        cached = self.domain_cache.get(name)
+        if cached is not None:
+            return cached['domain']
+
+        # 通过搜索引擎查找域名；网络出错不写缓存，下次重新尝试
+        with self.metrics.span('resolve'):
+            domain = self._search_domain(name)
+        self.domain_cache.set(name, domain)
         return domain
 
-    def download_google_favicon(self, domain, size=256):
-        """从Google Favicon服务下载图标"""
+    def prewarm_domain_cache(self, names, refresh=False):
+        """并发解析一批名称并写入缓存，已有有效缓存的名称默认跳过"""
+        names = [name.strip() for name in names if name.strip()]
+        if not refresh:
+            names = [name for name in names if self.domain_cache.get(name) is None]
+        else:
+            for name in names:
+                self.domain_cache.invalidate(name)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='icon-prewarm') as pool:
+            return dict(zip(names, pool.map(self.get_domain_from_name, names)))
+
+    def save_icon(self, data, domain, label, size=None, min_size=16, keep_larger=True):
+        """把下载到的图标数据保存为正方形PNG，返回 (文件路径, 尺寸, 原始尺寸)，不合格返回None
+
+        先只读文件头检查尺寸，太小的图标不做完整解码；目标尺寸默认为 size 与原始尺寸中
+        较大的一个（keep_larger=False 时固定为 size）。解码、缩放和编码交给图片流水线，
+        相同像素的结果只写一次。storage_mode 为 'native' 时不缩放，按原始分辨率保存，
+        需要的尺寸通过 serve_icon 获取。
+        """
+        original_size = header_size(data)
+        if original_size is None or original_size < min_size:
+            return None
+        if self.storage_mode == 'native':
+            target_size = original_size
+            render_size = None
+        else:
+            target_size = size or original_size
+            if keep_larger:
+                target_size = max(target_size, original_size)
+            render_size = target_size
+        filename = f"{self.clean_filename(domain)}_{label}_{target_size}.png"
+        with self.metrics.span('render'):
+            digest, actual_size, created, timings = self.image_pipeline.render(data, render_size, self.icon_store.blob_dir)
+        # 解码、缩放、保存在图片进程中计时
+        for stage, seconds in timings.items():
+            self.metrics.observe(stage, seconds)
+        filepath = self.icon_store.link(digest, actual_size, filename, domain, label, created)
+        return filepath, target_size, original_size
+
+    def serve_icon(self, filepath, size):
+        """返回已保存图标的 size×size 版本的路径，按需生成并缓存；未登记的文件原样返回"""
+        digest = self.icon_store.digest_of(os.path.basename(filepath))
+        if digest is None:
+            return filepath
+        return self.derivatives.get(digest, size)
+
+    def download_google_favicon(self, domain, size=256, failures=None):
+        """从Google Favicon服务下载图标，返回 save_icon 的 (文件路径, 尺寸, 原始尺寸)，失败返回None
+
+        failures 为列表时，服务因网络原因不可用则把服务名加入其中（见 download_one）。
+        """
         try:
-            url = f"https://www.google.com/s2/favicons?domain={domain}&sz={size}"
-            response = requests.get(url, headers=self.headers, timeout=10)
+            url = self.endpoints['Google Favicon'].format(domain=domain, size=size)
+            response = self.service_get('Google Favicon', url, timeout=10)
+            if unavailable_status(response.status_code) and failures is not None:
+                failures.append('Google Favicon')
             if response.status_code == 200:
-                filename = f"{self.clean_filename(domain)}_google_{size}.png"
-                filepath = os.path.join(self.output_dir, filename)
-                
-                # 保存原始图片
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
-                
-                # 调整图片大小
-                img = Image.open(filepath)
-                if img.size != (size, size):
-                    img = img.resize((size, size), Image.Resampling.LANCZOS)
-                    img.save(filepath, "PNG")
-                
-                return filepath
+                # 调整为请求的尺寸
+                return self.save_icon(response.content, domain, 'google', size, min_size=1, keep_larger=False)
+            return None
+        except (CircuitOpen, requests.exceptions.RequestException) as e:
+            print(f"Google Favicon 暂时不可用: {str(e) or '连续失败'}")
+            if failures is not None:
+                failures.append('Google Favicon')
             return None
         except Exception as e:
             print(f"Error downloading Google favicon for {domain}: {str(e)}")
             return None
 
-    def download_direct_favicon(self, domain):
-        """直接从网站下载favicon，尝试获取最大尺寸"""
+    def probe_icon(self, url, min_size, should_abort):
+        """探测一个图标地址，返回 (url, 内容, 尺寸)，不合格返回None
+
+        先用 Range 请求只取开头一段数据，从文件头判断尺寸，尺寸不够立即放弃；
+        服务器不支持 Range 时在同一连接上继续读完，支持时只对合格的图标再取一次全文。
+        """
+        with self.metrics.span('probe'):
+            result = self._probe_icon(url, min_size, should_abort)
+        if result:
+            self.metrics.count('bytes', 'direct', len(result[1]))
+        return result
+
+    def _probe_icon(self, url, min_size, should_abort):
+        # 连接错误直接抛给调用方，由调用方放弃同一主机的其余探测
+        response = self.http_get(url, timeout=5, stream=True, abort=should_abort,
+                                 headers=dict(self.headers, Range=f"bytes=0-{PROBE_BYTES - 1}"))
         try:
-            # 常见的图标路径
-            common_icon_paths = [
-                "/favicon.ico",
-                "/favicon.png",
-                "/apple-touch-icon.png",
-                "/apple-touch-icon-precomposed.png",
-                "/apple-touch-icon-120x120.png",
-                "/apple-touch-icon-152x152.png",
-                "/apple-touch-icon-180x180.png",
-                "/icon.png",
-                "/logo.png",
-                "/touch-icon-iphone.png"
-            ]
-            
-            urls_to_try = [
-                f"https://{domain}",
-                f"https://www.{domain}",
-                f"http://{domain}",
-                f"http://www.{domain}"
-            ]
-            
-            # 首先尝试直接访问常见的图标路径
-            for base_url in [f"https://{domain}", f"https://www.{domain}"]:
-                for path in common_icon_paths:
-                    try:
-                        icon_url = base_url + path
-                        print(f"尝试下载图标: {icon_url}")
-                        response = requests.get(icon_url, headers=self.headers, timeout=5)
-                        if response.status_code == 200:
-                            try:
-                                img = Image.open(BytesIO(response.content))
-                                if max(img.size) >= 32:  # 确保图标足够大
-                                    filename = f"{self.clean_filename(domain)}_direct_{max(img.size)}.png"
-                                    filepath = os.path.join(self.output_dir, filename)
-                                    img.save(filepath, "PNG")
-                                    print(f"成功从 {icon_url} 下载图标")
-                                    return filepath
-                            except:
-                                continue
-                    except:
+            if response.status_code not in (200, 206):
+                return None
+            chunks = response.iter_content(8192)
+            data = self._read_chunks(chunks, bytearray(), PROBE_BYTES, should_abort)
+            if data is None:
+                return None
+            # 文件头无法识别（常见的是返回200的HTML错误页）或尺寸不够，直接放弃
+            prefix_size = header_size(data)
+            if prefix_size is None or prefix_size < min_size:
+                return None
+
+            if response.status_code == 200:
+                data = self._read_chunks(chunks, data, MAX_ICON_BYTES, should_abort)
+            elif not range_complete(response, len(data)):
+                response.close()
+                response = self.http_get(url, timeout=5, stream=True, abort=should_abort)
+                if response.status_code != 200:
+                    return None
+                data = self._read_chunks(response.iter_content(8192), bytearray(), MAX_ICON_BYTES, should_abort)
+            if data is None:
+                return None
+
+            actual_size = header_size(data)
+            if actual_size is None or actual_size < min_size:
+                return None
+            return (url, bytes(data), actual_size)
+        except Exception:
+            return None
+        finally:
+            response.close()
+
+    def _read_chunks(self, chunks, data, limit, should_abort):
+        """从响应块迭代器中继续读取，直到读满limit或响应结束；中途被取消返回None"""
+        for chunk in chunks:
+            if should_abort():
+                return None
+            data += chunk
+            if len(data) >= limit:
+                break
+        return data
+
+    def fetch_homepage(self, url):
+        """请求网站首页，成功返回 (最终地址, 图标候选列表, manifest地址)
+
+        只流式读取到 </head> 为止（最多 HEAD_MAX_BYTES），不下载整个页面。
+        """
+        print(f"尝试访问网站: {url}")
+        with self.metrics.span('homepage'):
+            response = self.http_get(url, timeout=5, stream=True)
+            if response.status_code != 200:
+                response.close()
+                return None
+            links = stream_parse(response, HeadLinkParser(), HEAD_MAX_BYTES).links
+        candidates, manifest_url = link_candidates(response.url, links)
+        return (response.url, candidates, manifest_url)
+
+    def fetch_manifest(self, url):
+        """请求 Web App Manifest，返回其中的图标候选"""
+        response = self.http_get(url, timeout=5)
+        if response.status_code != 200:
+            return []
+        return manifest_candidates(response.url, response.text)
+
+    def download_direct_favicon(self, domain, size=None, max_in_flight=3, failures=None):
+        """直接从网站下载favicon，按预期质量分批探测
+
+        首页和排名最高的几个惯例路径同时请求；首页返回后把 <link rel=icon>
+        （含 sizes 属性）和 manifest.json 中的图标加入候选并重新排序。
+        同时最多探测 max_in_flight 个候选，任一图标达到所需尺寸就取消其余探测，
+        否则探测完全部候选后取最大的一个。连接失败的站点不再继续探测。
+        failures 为列表时，网站的所有地址都连接失败或超时则把 DIRECT_SERVICE 加入其中。
+        返回 save_icon 的 (文件路径, 尺寸, 原始尺寸)，失败返回None。
+        """
+        with self.metrics.span('fetch', 'direct'):
+            saved = self._download_direct_favicon(domain, size, max_in_flight, failures)
+        self.metrics.count('hits' if saved else 'misses', 'direct')
+        return saved
+
+    def _download_direct_favicon(self, domain, size, max_in_flight, failures=None):
+        min_size = 32  # 确保图标足够大
+        target_size = max(size or min_size, min_size)
+        try:
+            urls_to_try = list(dict.fromkeys(template.format(domain=domain) for template in self.endpoints['homepages']))
+
+            stop = threading.Event()
+            dead_hosts = set()
+            seen = set()
+            kinds = {}
+            queue = plan(convention_candidates(urls_to_try[:2]), target_size, min_size)
+            homepage_found = False
+
+            def launch_probes():
+                """补足正在探测的候选数，跳过已探测的地址和不可用的站点"""
+                in_flight = sum(1 for kind, _ in kinds.values() if kind == 'icon')
+                while queue and in_flight < max_in_flight:
+                    candidate = queue.pop(0)
+                    host = origin_of(candidate.url)
+                    if candidate.url in seen or host in dead_hosts:
                         continue
-            
-            # 如果直接访问失败，尝试从HTML中查找图标链接
-            response = None
+                    seen.add(candidate.url)
+                    print(f"尝试下载图标: {candidate.url} (预期 {candidate.size or '未知'})")
+                    future = self.io_pool.submit(self.probe_icon, candidate.url, min_size,
+                                                 lambda host=host: stop.is_set() or host in dead_hosts)
+                    kinds[future] = ('icon', host)
+                    in_flight += 1
+
             for url in urls_to_try:
-                try:
-                    print(f"尝试访问网站: {url}")
-                    response = requests.get(url, headers=self.headers, timeout=5)
-                    if response.status_code == 200:
+                kinds[self.io_pool.submit(self.fetch_homepage, url)] = ('home', origin_of(url))
+            launch_probes()
+
+            best_icon = None
+            reached = False
+            try:
+                while kinds:
+                    done, _ = wait(set(kinds), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        kind, host = kinds.pop(future)
+                        try:
+                            result = future.result()
+                        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                            # 连接失败或超时说明整个站点不可用，同站点排队中的探测直接放弃
+                            dead_hosts.add(host)
+                            if isinstance(e, requests.exceptions.Timeout):
+                                self.metrics.count('timeouts', 'direct')
+                            continue
+                        except Exception:
+                            continue
+                        reached = True
+                        if not result:
+                            continue
+                        if kind == 'home':
+                            # 只解析最先返回的首页，其中声明的图标和 manifest 加入候选
+                            if homepage_found:
+                                continue
+                            homepage_found = True
+                            _, candidates, manifest_url = result
+                            if manifest_url:
+                                kinds[self.io_pool.submit(self.fetch_manifest, manifest_url)] = ('manifest', origin_of(manifest_url))
+                            queue[:] = plan(queue + candidates, target_size, min_size)
+                        elif kind == 'manifest':
+                            queue[:] = plan(queue + result, target_size, min_size)
+                        elif best_icon is None or result[2] > best_icon[2]:
+                            best_icon = result
+                            print(f"找到图标: {result[0]} ({result[2]}x{result[2]})")
+                    if best_icon and best_icon[2] >= target_size:
                         break
-                except Exception as e:
-                    print(f"访问 {url} 失败: {str(e)}")
-                    continue
-                    
-            if response and response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # 查找所有可能的图标链接
-                icon_links = []
-                for link in soup.find_all('link'):
-                    rel = link.get('rel', [])
-                    if isinstance(rel, str):
-                        rel = [rel]
-                    if any(r.lower() in ['icon', 'shortcut icon', 'apple-touch-icon', 'apple-touch-icon-precomposed', 'fluid-icon', 'mask-icon'] for r in rel):
-                        href = link.get('href')
-                        if href:
-                            # 尝试从href中提取尺寸信息
-                            size_match = re.search(r'(\d+)x(\d+)', href)
-                            if size_match:
-                                size = int(size_match.group(1))
-                            else:
-                                size = 0
-                            icon_links.append((href, size))
-
-                # 按尺寸排序图标链接
-                icon_links.sort(key=lambda x: x[1], reverse=True)
-                
-                best_icon = None
-                best_size = 0
-                
-                for link, size in icon_links:
-                    try:
-                        if link.startswith('//'):
-                            link = f"https:{link}"
-                        elif link.startswith('/'):
-                            link = f"https://{domain}{link}"
-                        elif not link.startswith(('http://', 'https://')):
-                            link = f"https://{domain}/{link}"
-
-                        print(f"尝试下载图标: {link}")
-                        icon_response = requests.get(link, headers=self.headers, timeout=5)
-                        if icon_response.status_code == 200:
-                            img = Image.open(BytesIO(icon_response.content))
-                            actual_size = max(img.size)
-                            if actual_size > best_size and actual_size >= 32:  # 确保图标足够大
-                                best_size = actual_size
-                                best_icon = (link, icon_response.content, actual_size)
-                                print(f"找到更大的图标: {link} ({actual_size}x{actual_size})")
-                    except Exception as e:
-                        print(f"下载图标 {link} 失败: {str(e)}")
-                        continue
+                    launch_probes()
+            finally:
+                # 取消其余探测：未开始的直接取消，进行中的在下次读取时中断
+                stop.set()
+                for future in kinds:
+                    future.cancel()
 
-                if best_icon:
-                    filename = f"{self.clean_filename(domain)}_direct_{best_icon[2]}.png"
-                    filepath = os.path.join(self.output_dir, filename)
-                    
-                    try:
-                        # 保存并调整图片大小
-                        img = Image.open(BytesIO(best_icon[1]))
-                        target_size = max(img.size)  # 使用最大的边长作为目标尺寸
-                        if img.size != (target_size, target_size):
-                            img = img.resize((target_size, target_size), Image.Resampling.LANCZOS)
-                        img.save(filepath, "PNG")
-                        print(f"成功保存图标: {filepath}")
-                        return filepath
-                    except Exception as e:
-                        print(f"保存图标失败: {str(e)}")
-                        return None
+            if not reached and dead_hosts and failures is not None:
+                failures.append(DIRECT_SERVICE)
+            self.service_history.record('direct', best_icon[2] if best_icon else None)
+            if best_icon:
+                try:
+                    # 保存为正方形，原始尺寸大于目标尺寸时保持原始尺寸（同在线服务）
+                    saved = self.save_icon(best_icon[1], domain, 'direct', size, min_size=min_size)
+                    if saved:
+                        print(f"成功从 {best_icon[0]} 下载图标: {saved[0]}")
+                    return saved
+                except Exception as e:
+                    print(f"保存图标失败: {str(e)}")
+                    return None
 
             return None
         except Exception as e:
             print(f"Error downloading direct favicon for {domain}: {str(e)}")
             return None
 
-    def download_icon_from_services(self, domain, size=256):
-        """从多个图标服务下载图标"""
+    def get_icon_services(self, domain, size=256):
+        """已启用的在线图标服务列表，按当前健康状况排序（断开的在最后），顺序即结果顺序"""
         services = [
             {
-                'name': 'Google Favicon',
-                'url': f"https://www.google.com/s2/favicons?domain={domain}&sz={size}",
-                'type': 'direct'
-            },
-            {
-                'name': 'DuckDuckGo',
-                'url': f"https://icons.duckduckgo.com/ip3/{domain}.ico",
-                'type': 'direct'
-            },
-            {
-                'name': 'Yandex',
-                'url': f"https://favicon.yandex.net/favicon/{domain}",
-                'type': 'direct'
-            },
-            {
-                'name': 'ico.kucat.cn',
-                'url': f"https://ico.kucat.cn/get.php?url={domain}",
+                'name': name,
+                'url': self.endpoints[name].format(domain=domain, size=size),
                 'type': 'direct'
             }
+            for name in self.health.order(ICON_SERVICES)
         ]
-        
-        results = []
-        for service in services:
+        if self.services is None:
+            return services
+        return [service for service in services if service['name'] in self.services]
+
+    def direct_enabled(self):
+        return self.services is None or 'direct' in self.services
+
+    def download_from_service(self, service, domain, size=256, abort=None, failures=None):
+        """从单个图标服务下载图标，失败返回None
+
+        abort 是可选的回调，返回True时不再发出请求，已收到的响应也不再保存（对冲请求中落败的一方）。
+        failures 为列表时，服务因网络原因不可用（连接失败、超时、5xx、429、断路器断开）则把服务名加入其中，
+        以便调用方区分“没有图标”和“没能问到”。
+        """
+        unavailable = False
+        result = None
+        outcome = 'misses'
+        metrics = self.metrics
+        with metrics.span('fetch', service['name']):
             try:
                 print(f"尝试从 {service['name']} 下载图标...")
-                response = requests.get(service['url'], headers=self.headers, timeout=10)
+                response = self.service_get(service['name'], service['url'], timeout=10, abort=abort)
+                metrics.count('bytes', service['name'], len(response.content))
+                if getattr(response, 'from_cache', False):
+                    metrics.count('cached', service['name'])
+                if abort is not None and abort():
+                    return None
+                unavailable = unavailable_status(response.status_code)
                 if response.status_code == 200:
                     try:
-                        img = Image.open(BytesIO(response.content))
-                        
-                        # 确保图标不是空的且尺寸合适
-                        if max(img.size) >= 16:  # 确保图标不是空的
-                            # 获取原始尺寸
-                            original_size = max(img.size)
-                            
-                            # 如果原始尺寸大于目标尺寸，保持原始尺寸
-                            target_size = max(size, original_size)
-                            
-                            # 转换为RGBA模式以保持透明度
-                            if img.mode != 'RGBA':
-                                img = img.convert('RGBA')
-                            
-                            # 调整图片大小（如果需要）
-                            if img.size != (target_size, target_size):
-                                img = img.resize((target_size, target_size), Image.Resampling.LANCZOS)
-                            
-                            # 在文件名中使用实际尺寸
-                            filename = f"{self.clean_filename(domain)}_{service['name']}_{target_size}.png"
-                            filepath = os.path.join(self.output_dir, filename)
-                            
-                            # 保存图片
-                            img.save(filepath, "PNG")
-                            
+                        # 确保图标不是空的；原始尺寸大于目标尺寸时保持原始尺寸
+                        saved = self.save_icon(response.content, domain, service['name'], size)
+                        if saved:
+                            filepath, target_size, original_size = saved
                             print(f"从 {service['name']} 成功下载图标，实际尺寸: {target_size}x{target_size}")
-                            results.append({
+                            result = {
                                 'service': service['name'],
                                 'filepath': filepath,
-                                'size': target_size
-                            })
+                                'size': target_size,
+                                'original_size': original_size
+                            }
+                            outcome = 'hits'
                     except Exception as e:
                         print(f"处理 {service['name']} 图标时出错: {str(e)}")
+                        outcome = 'errors'
+            except CircuitOpen:
+                print(f"{service['name']} 暂时不可用，跳过")
+                metrics.count('skipped', service['name'])
+                if failures is not None:
+                    failures.append(service['name'])
+                return None
+            except RequestAborted:
+                return None
+            except requests.exceptions.Timeout as e:
+                print(f"从 {service['name']} 下载超时: {str(e)}")
+                outcome = 'timeouts'
+                unavailable = True
+            except requests.exceptions.RequestException as e:
+                print(f"从 {service['name']} 下载失败: {str(e)}")
+                outcome = 'errors'
+                unavailable = True
             except Exception as e:
                 print(f"从 {service['name']} 下载失败: {str(e)}")
-                continue
-        
+                outcome = 'errors'
+        if unavailable and failures is not None:
+            failures.append(service['name'])
+        metrics.count(outcome, service['name'])
+        self.service_history.record(service['name'], result['original_size'] if result else None)
+        return result
+
+    def download_icon_from_services(self, domain, size=256):
+        """从多个图标服务并行下载图标，结果按服务顺序返回"""
+        services = self.get_icon_services(domain, size)
+        futures = [self.io_pool.submit(self.download_from_service, service, domain, size)
+                   for service in services]
+        return [result for result in (f.result() for f in futures) if result]
+
+    def hedge_delay(self, service_name):
+        """对冲请求中等待该服务多久再请求下一个服务"""
+        latency = self.health.latency(service_name)
+        if latency is None:
+            return HEDGE_DELAY
+        return min(max(latency * HEDGE_FACTOR, HEDGE_MIN_DELAY), HEDGE_MAX_DELAY)
+
+    def download_hedged(self, domain, size=256, services=None, delay=None, should_abort=None, failures=None):
+        """对冲请求，用于交互式的单个查询：先请求预期最快的服务，一段时间内没有结果再加上下一个
+
+        服务按健康状况排序（见 HealthTracker.order）；某个服务失败或图标不够大时立即请求下一个，
+        否则等待 delay 秒（None 时见 hedge_delay）。第一个原始尺寸达到 size 的图标胜出，
+        其余请求随即取消：尚未发出的不再发出，已收到的响应不再保存。
+        services 限定使用的服务名；should_abort 返回True时停止；failures 见 download_from_service。
+        返回 [胜出的结果]；没有达到 size 的图标时返回已拿到的所有结果，可能为空。
+        """
+        candidates = [service for service in self.get_icon_services(domain, size)
+                      if services is None or service['name'] in services]
+        stopped = threading.Event()
+
+        def abort():
+            return stopped.is_set() or (should_abort is not None and should_abort())
+
+        running = {}
+        results = []
+        winner = None
+        try:
+            while winner is None and (candidates or running) and not abort():
+                if candidates:
+                    service = candidates.pop(0)
+                    future = self.io_pool.submit(self.download_from_service, service, domain, size, abort, failures)
+                    running[future] = service['name']
+                    timeout = self.hedge_delay(service['name']) if delay is None else delay
+                else:
+                    # 所有服务都已发出，定时醒来检查 should_abort
+                    timeout = HEDGE_MAX_DELAY
+                finished, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    del running[future]
+                    result = future.result()
+                    if not result:
+                        continue
+                    results.append(result)
+                    if winner is None and (result['original_size'] or 0) >= size:
+                        winner = result
+        finally:
+            stopped.set()
+            for future in running:
+                future.cancel()
+        if winner is not None:
+            print(f"对冲请求：{winner['service']} 最先返回 {winner['original_size']}px 图标")
+            return [winner]
         return results
 
-    def download_icons(self, names_or_domains):
-        """下载多个名称或域名的图标"""
+    def fetch_service(self, service, domain, size, name=None, journal=None, failures=None):
+        """download_from_service 加上作业日志：已成功过的直接复用，新的结果写入日志"""
+        if journal is not None:
+            done = journal.service_result(name, service['name'])
+            if done:
+                return done
+        result = self.download_from_service(service, domain, size, failures=failures)
+        if journal is not None:
+            journal.record_service(name, domain, service['name'], result)
+        return result
+
+    def fetch_direct(self, domain, size, name=None, journal=None, failures=None):
+        """直接从网站下载，返回下载结果字典；作业日志的用法同 fetch_service"""
+        if not self.direct_enabled():
+            return None
+        if journal is not None:
+            done = journal.service_result(name, DIRECT_SERVICE)
+            if done:
+                return done
+        saved = self.download_direct_favicon(domain, size, failures=failures)
+        result = self.direct_result(saved) if saved else None
+        if journal is not None:
+            journal.record_service(name, domain, DIRECT_SERVICE, result)
+        return result
+
+    def download_best(self, domain, size=256, wave=2, name=None, journal=None, failures=None):
+        """按历史表现从好到差分批请求图标服务和网站本身，拿到足够大的图标就停止
+
+        历史得分再结合当前的成功率和耗时（见 HealthTracker.order），断开的服务排在最后。
+        每批 wave 个来源同时请求；直接下载在当前线程进行（它自己会向 io 线程池提交探测）。
+        """
+        services = {service['name']: service for service in self.get_icon_services(domain, size)}
+        order = self.health.order(list(services) + (['direct'] if self.direct_enabled() else []),
+                                  lambda service: self.service_history.score(service, size))
         results = []
-        for name in tqdm(names_or_domains, desc="Downloading icons"):
-            domain = self.get_domain_from_name(name)
-            if not domain:
-                results.append({
-                    'name': name,
-                    'domain': None,
-                    'error': '未找到对应的域名',
-                    'icons': []
-                })
-                continue
-
-            # 添加延时避免请求过快
-            time.sleep(1)
-            
-            # 从各个服务下载图标
-            service_results = self.download_icon_from_services(domain)
-            
-            # 尝试直接从网站下载
-            direct_result = self.download_direct_favicon(domain)
-            if direct_result:
-                service_results.append({
-                    'service': '直接下载',
-                    'filepath': direct_result,
-                    'size': 0  # 这里可以读取实际文件获取尺寸
-                })
-            
-            results.append({
+        for i in range(0, len(order), wave):
+            batch = order[i:i + wave]
+            futures = [self.io_pool.submit(self.fetch_service, services[service], domain, size, name, journal, failures)
+                       for service in batch if service != 'direct']
+            if 'direct' in batch:
+                direct_result = self.fetch_direct(domain, size, name, journal, failures)
+                if direct_result:
+                    results.append(direct_result)
+            results.extend(result for result in (f.result() for f in futures) if result)
+            best = self.best_icon(results)
+            if best and self.original_size(best) >= size:
+                break
+        return results
+
+    def direct_result(self, saved, service=DIRECT_SERVICE):
+        """由 download_direct_favicon 返回的 (文件路径, 尺寸, 原始尺寸) 生成下载结果字典"""
+        filepath, target_size, original_size = saved
+        return {
+            'service': service,
+            'filepath': filepath,
+            'size': target_size,
+            'original_size': original_size
+        }
+
+    def download_one(self, name, size=256, export_formats=None, strategy='all', journal=None):
+        """处理单个名称：解析域名，然后请求各图标服务和网站本身
+
+        strategy='all' 时所有来源并行请求；'best' 时按历史表现分批请求，
+        拿到达到 size 的图标就停止（见 download_best）；'hedged' 时对在线服务发对冲请求（见 download_hedged），
+        没有拿到达到 size 的图标时再直接从网站下载。
+        export_formats 不为空时，下载完成后从最佳图标导出完整图标集（见 export_icon_set）。
+        journal 为 JobJournal 时记录每个服务的结果，并跳过日志中已成功的服务。
+        域名解析或某个来源因网络原因失败时，结果中 'failed_sources' 列出这些来源（解析失败为 'resolve'），
+        此时结果不完整，JobJournal 不把该名称记为完成。
+        """
+        try:
+            domain = self.resolve_domain(name)
+        except Exception as e:
+            print(f"Error searching domain for {name}: {str(e)}")
+            return {
                 'name': name,
-                'domain': domain,
-                'icons': service_results
-            })
+                'domain': None,
+                'error': f'域名解析失败: {str(e)}',
+                'icons': [],
+                'failed_sources': ['resolve']
+            }
+        if not domain:
+            return {
+                'name': name,
+                'domain': None,
+                'error': '未找到对应的域名',
+                'icons': []
+            }
+
+        failures = []
+        if strategy == 'best':
+            service_results = self.download_best(domain, size, name=name, journal=journal, failures=failures)
+        elif strategy == 'hedged':
+            service_results = self.download_hedged(domain, size, failures=failures)
+            if journal is not None:
+                for service_result in service_results:
+                    journal.record_service(name, domain, service_result['service'], service_result)
+            if len(service_results) != 1 or self.original_size(service_results[0]) < size:
+                direct_result = self.fetch_direct(domain, size, name, journal, failures)
+                if direct_result:
+                    service_results.append(direct_result)
+        else:
+            # 在线服务交给 io 线程池，直接下载在当前线程进行，两者同时进行
+            # （io 线程池中的任务不再向线程池提交任务，避免互相等待）
+            futures = [self.io_pool.submit(self.fetch_service, service, domain, size, name, journal, failures)
+                       for service in self.get_icon_services(domain, size)]
+            direct_result = self.fetch_direct(domain, size, name, journal, failures)
+            service_results = [result for result in (f.result() for f in futures) if result]
+            if direct_result:
+                service_results.append(direct_result)
+        if strategy != 'all' and service_results and self.original_size(self.best_icon(service_results)) >= size:
+            # best / hedged 只要一个足够大的图标，已经拿到时其他来源的失败不影响结果
+            failures = []
+
+        result = {
+            'name': name,
+            'domain': domain,
+            'icons': service_results
+        }
+        if failures:
+            result['failed_sources'] = sorted(set(failures))
+        if export_formats and service_results:
+            result['icon_set'] = self.export_icon_set(result, formats=export_formats)
+        return result
+
+    def original_size(self, icon):
+        """下载结果的原始分辨率，没有记录时读取文件头"""
+        if icon.get('original_size'):
+            return icon['original_size']
+        with open(icon['filepath'], 'rb') as f:
+            return header_size(f.read(PROBE_BYTES)) or 0
+
+    def best_icon(self, icons):
+        """原始分辨率最高的图标（放大过的不算），没有返回None"""
+        return max(icons, key=self.original_size) if icons else None
+
+    def export_icon_set(self, result, sizes=None, formats=('ico', 'png'), out_dir=None):
+        """从一个名称的最佳下载结果导出图标集（ICO多帧 + 各尺寸PNG，可选WebP）
+
+        只解码一次原图，逐级缩小生成所有尺寸，在图片进程池中执行。sizes 默认为 self.export_sizes。
+        保存的文件可能已按请求尺寸放大过，因此只导出不超过原始分辨率的尺寸，不从放大的图生成“高清”版本。
+        """
+        sizes = sizes or self.export_sizes
+        best = self.best_icon(result.get('icons') or [])
+        if not best:
+            return None
+        original_size = self.original_size(best)
+        sizes = [s for s in sizes if s <= original_size] or [min(sizes)]
+        basename = self.clean_filename(result['domain'])
+        out_dir = out_dir or os.path.join(self.output_dir, 'icon_sets', basename)
+        try:
+            with self.metrics.span('export'):
+                exported = self.image_pipeline.export(best['filepath'], out_dir, basename, tuple(sizes), tuple(formats))
+            print(f"已从 {best['service']} 的图标导出图标集: {out_dir}")
+            return exported
+        except Exception as e:
+            print(f"导出图标集失败: {str(e)}")
+            return None
+
+    def download_icons(self, names_or_domains, size=256, export_formats=None, strategy='all',
+                       journal_path=None, resume=False, metrics_path=None):
+        """并发下载多个名称或域名的图标，结果按输入顺序返回
+
+        同时处理的名称数由 max_workers 决定，请求速率由全局/单主机并发上限约束，
+        因此不再需要每个名称之间固定等待。参数见 iter_download_icons。
+        """
+        names_or_domains = list(names_or_domains)
+        results = [None] * len(names_or_domains)
+        completed = self.iter_download_icons(names_or_domains, size, export_formats, strategy, journal_path, resume,
+                                             metrics_path)
+        for i, result in tqdm.tqdm(completed, total=len(names_or_domains), desc="Downloading icons"):
+            results[i] = result
         return results
 
+    def job_params(self, size, strategy='all', export_formats=None):
+        """影响下载结果的参数，作业日志据此判断能否续传（见 JobJournal）"""
+        return {
+            'size': size,
+            'strategy': strategy,
+            'services': sorted(self.services) if self.services is not None else None,
+            'storage_mode': self.storage_mode,
+            'export': sorted(export_formats) if export_formats else None,
+            'export_sizes': sorted(self.export_sizes) if export_formats else None,
+        }
+
+    def iter_download_icons(self, names_or_domains, size=256, export_formats=None, strategy='all',
+                            journal_path=None, resume=False, metrics_path=None):
+        """并发下载，每个名称处理完立即产出 (输入序号, 结果)，顺序为完成顺序
+
+        strategy 见 download_one。journal_path 指定时把每个名称和服务的结果追加写入该 JSONL 日志；
+        resume=True 时跳过日志中已完成的名称（直接产出记录的结果），未完成的名称只重试没成功的服务；
+        日志属于参数不同的任务时抛出 JournalMismatch。
+        self.metrics 在开始时清零；metrics_path 指定时结束后写出本批的耗时和计数（.json 或 .prom，见 Metrics.export）。
+        """
+        names_or_domains = list(names_or_domains)
+        journal = None
+        if journal_path:
+            journal = JobJournal(journal_path, resume, self.job_params(size, strategy, export_formats))
+        self.metrics.reset()
+        try:
+            pending = []
+            for i, name in enumerate(names_or_domains):
+                done = journal.completed(name) if journal is not None else None
+                if done:
+                    yield i, done
+                else:
+                    pending.append(i)
+            if len(pending) < len(names_or_domains):
+                print(f"续传：跳过 {len(names_or_domains) - len(pending)} 个已完成的名称")
+
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='icon-batch') as pool:
+                futures = {pool.submit(self.download_one, names_or_domains[i], size, export_formats, strategy, journal): i
+                           for i in pending}
+                try:
+                    for future in as_completed(futures):
+                        i = futures[future]
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            # 异常失败的名称不记为完成，续传时会重试
+                            yield i, {
+                                'name': names_or_domains[i],
+                                'domain': None,
+                                'error': str(e),
+                                'icons': []
+                            }
+                            continue
+                        if journal is not None:
+                            journal.record_name(result)
+                        yield i, result
+                finally:
+                    # 调用方提前结束迭代时不再开始新的名称
+                    for future in futures:
+                        future.cancel()
+        finally:
+            if journal is not None:
+                journal.close()
+            self.icon_store.flush()
+            self.service_history.save()
+            if metrics_path:
+                self.metrics.export(metrics_path)
+
     def clean_filename(self, filename):
         """清理文件名，移除非法字符"""
         return re.sub(r'[<>:"/\\|?*]', '', filename)
 
 def main():
+    multiprocessing.freeze_support()
     downloader = IconDownloader()
     print("欢迎使用图标下载器！")
     print("请输入要下载图标的名称或域名（多个名称或域名用逗号分隔）")
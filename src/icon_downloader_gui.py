@@ -1,16 +1,32 @@
+from startup_timing import StartupTimer, report_requested
+
+# 在导入 ttkbootstrap 等模块之前开始计时，启动报告中才包含它们的导入耗时
+startup = StartupTimer()
+startup.install()
+
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 import threading
-from icon_downloader import IconDownloader
-import os
-import requests
-from PIL import Image
-from io import BytesIO
 import time
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import json
+import hashlib
+from job_journal import JobJournal, JournalMismatch
+from gui_events import EventPump
+from icon_gallery import IconGallery
+from lazy_import import lazy_module
+from concurrency import backoff_delay
+from service_health import CircuitOpen
+import os
+import multiprocessing
+
+# icon_downloader（连同映射索引、requests、PIL）在窗口显示后由后台线程导入
+requests = lazy_module('requests')
+
+# 输出框最多保留的行数，超出后删除最早的行
+MAX_LOG_LINES = 5000
+
 
 class IconDownloaderGUI:
     def __init__(self, root):
@@ -127,6 +143,45 @@ class IconDownloaderGUI:
                                bootstyle="primary-toolbutton")
             rb.pack(side=tk.LEFT, padx=5)
             ToolTip(rb, f"选择 {size}x{size} 像素的图标尺寸")
+
+        # 按原始尺寸保存：所选尺寸只决定展示哪个派生版本
+        self.native_var = tk.BooleanVar(value=False)
+        native_cb = ttk.Checkbutton(size_card,
+                                    text="保留原始尺寸，按需生成所选尺寸",
+                                    variable=self.native_var,
+                                    bootstyle="primary-round-toggle")
+        native_cb.pack(anchor=tk.W, pady=(0, 5))
+        ToolTip(native_cb, "图标按原始分辨率保存，不再放大；\n所选尺寸的版本在需要时生成并缓存")
+        self.size_var.trace_add('write', self.on_size_changed)
+
+        # 下载后导出完整图标集
+        self.export_var = tk.BooleanVar(value=False)
+        export_cb = ttk.Checkbutton(size_card,
+                                    text="导出完整图标集（ICO + 各尺寸PNG）",
+                                    variable=self.export_var,
+                                    bootstyle="primary-round-toggle")
+        export_cb.pack(anchor=tk.W, pady=(0, 5))
+        ToolTip(export_cb, "从下载到的最清晰图标一次生成 16~256 多帧ICO和 16~512 的PNG")
+
+        # 断点续传：跳过上次已完成的名称和服务
+        self.resume_var = tk.BooleanVar(value=True)
+        resume_cb = ttk.Checkbutton(size_card,
+                                    text="断点续传",
+                                    variable=self.resume_var,
+                                    bootstyle="primary-round-toggle")
+        resume_cb.pack(anchor=tk.W, pady=(0, 5))
+        ToolTip(resume_cb, "下载进度记录在作业日志中，中断或关闭窗口后以相同的名称和选项再次下载，\n会跳过已完成的部分；关闭后重新开始并清空日志")
+
+        # 单个名称时对冲请求：先请求最快的服务，稍等没有结果再请求下一个
+        self.hedge_var = tk.BooleanVar(value=True)
+        hedge_cb = ttk.Checkbutton(size_card,
+                                   text="快速查询（单个名称）",
+                                   variable=self.hedge_var,
+                                   bootstyle="primary-round-toggle")
+        hedge_cb.pack(anchor=tk.W, pady=(0, 5))
+        ToolTip(hedge_cb, "只输入一个名称时，先请求预期最快的服务，短时间内没有结果再请求下一个；\n"
+                          "拿到所选尺寸的图标就停止，其余请求取消")
+        self.last_results = []
         
         # 创建右侧卡片
         right_card = ttk.Frame(main_frame)
@@ -190,10 +245,11 @@ class IconDownloaderGUI:
         button_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(20, 10))
         
         self.download_button = ttk.Button(button_frame, 
-                                        text="开始下载",
+                                        text="正在加载...",
                                         command=self.toggle_download,
                                         bootstyle="success",
-                                        width=25)
+                                        width=25,
+                                        state='disabled')
         self.download_button.pack(side=tk.LEFT)
         ToolTip(self.download_button, "点击开始下载或停止下载")
         
@@ -218,7 +274,13 @@ class IconDownloaderGUI:
                                    bootstyle="primary")
         output_card.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
         
-        self.output_text = scrolledtext.ScrolledText(output_card, 
+        # 日志和缩略图预览分两个标签页
+        output_tabs = ttk.Notebook(output_card)
+        output_tabs.pack(fill=tk.BOTH, expand=True)
+        log_tab = ttk.Frame(output_tabs)
+        output_tabs.add(log_tab, text="日志")
+        
+        self.output_text = scrolledtext.ScrolledText(log_tab, 
                                                    width=80,
                                                    height=12,
                                                    font=self.default_font)
@@ -229,13 +291,13 @@ class IconDownloaderGUI:
         status_frame.grid(row=5, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
         
         self.status_label = ttk.Label(status_frame, 
-                                    text="就绪",
+                                    text="正在加载域名映射...",
                                     font=self.small_font,
                                     bootstyle="secondary")
         self.status_label.pack(side=tk.RIGHT)
         
-        # 下载器实例
-        self.downloader = IconDownloader()
+        # 下载器实例：窗口显示后在后台创建，创建完成前不能开始下载
+        self.downloader = None
         
         # 配置根窗口的网格权重
         root.grid_rowconfigure(0, weight=1)
@@ -252,21 +314,51 @@ class IconDownloaderGUI:
         # 设置最小窗口大小
         root.minsize(900, 700)
         
-        # 配置请求会话
-        self.session = requests.Session()
-        retries = Retry(
-            total=3,
-            backoff_factor=0.5,
-            status_forcelist=[500, 502, 503, 504],
-            allowed_methods=["GET"]
-        )
-        self.session.mount('http://', HTTPAdapter(max_retries=retries))
-        self.session.mount('https://', HTTPAdapter(max_retries=retries))
-
         # 添加下载状态控制
         self.is_downloading = False
         self.download_thread = None
 
+        # 工作线程的日志和进度经事件队列交给主线程批量处理
+        self.events = EventPump(root)
+        self.events.on('log', self.append_log)
+        self.events.on('progress', self.set_progress)
+        self.events.on('finished', self.on_finished)
+        self.events.on('results', self.add_results)
+        self.events.start()
+
+        # 缩略图只为可见的行生成
+        self.gallery = IconGallery(output_tabs, self.events)
+        output_tabs.add(self.gallery, text="预览")
+
+        self.events.on('downloader_ready', self.on_downloader_ready)
+        root.after_idle(self.on_window_shown)
+
+    def on_window_shown(self):
+        """主线程：窗口第一次显示后开始在后台加载下载器"""
+        startup.mark('窗口显示')
+        threading.Thread(target=self.load_downloader, daemon=True).start()
+
+    def load_downloader(self):
+        """后台线程：导入下载模块并加载映射索引"""
+        try:
+            from icon_downloader import IconDownloader
+            self.events.post('downloader_ready', IconDownloader(), None)
+        except Exception as e:
+            self.events.post('downloader_ready', None, str(e))
+
+    def on_downloader_ready(self, downloader, error):
+        """主线程：下载器就绪后允许开始下载，并记录启动耗时"""
+        if error:
+            self.status_label.config(text="加载失败")
+            messagebox.showerror("错误", f"加载下载器失败: {error}", font=self.default_font)
+            startup.uninstall()
+            return
+        self.downloader = downloader
+        self.download_button.config(text="开始下载", state='normal')
+        self.status_label.config(text="就绪")
+        startup.mark('可以操作')
+        startup.finish(os.path.join(downloader.cache_dir, 'startup.jsonl'), print_report=report_requested())
+
     def toggle_download(self):
         """切换下载状态"""
         if not self.is_downloading:
@@ -281,6 +373,7 @@ class IconDownloaderGUI:
             # 禁用界面元素
             self.input_text.config(state='disabled')
             self.output_text.delete("1.0", tk.END)
+            self.gallery.clear()
             self.progress['value'] = 0
             
             # 更改按钮状态和文本
@@ -290,9 +383,18 @@ class IconDownloaderGUI:
             
             # 设置下载状态
             self.is_downloading = True
+            self.downloader.storage_mode = 'native' if self.native_var.get() else 'eager'
+            self.last_results = []
             
-            # 在新线程中执行下载
-            self.download_thread = threading.Thread(target=self.download_task, args=(names,))
+            # 在新线程中执行下载；界面上的选项在这里读取，工作线程不访问 Tk 变量
+            options = {
+                'size': int(self.size_var.get()),
+                'services': self.get_selected_services(),
+                'export': self.export_var.get(),
+                'resume': self.resume_var.get(),
+                'hedge': self.hedge_var.get(),
+            }
+            self.download_thread = threading.Thread(target=self.download_task, args=(names, options))
             self.download_thread.daemon = True
             self.download_thread.start()
         else:
@@ -309,174 +411,312 @@ class IconDownloaderGUI:
             if self.download_thread and self.download_thread.is_alive():
                 self.download_thread.join(0.1)
 
-    def download_task(self, names):
+    def job_journal(self, names, options):
+        """本次任务的作业日志
+
+        每个任务（名称列表 + 影响结果的参数）一个日志文件：中断后以同样的输入和选项再次下载时续传，
+        换了尺寸、服务或名称就是新的任务，不会拿上次的结果充数。任务全部完成后日志即删除。
+        """
+        params = {
+            'size': options['size'],
+            'services': sorted(options['services']),
+            'storage_mode': self.downloader.storage_mode,
+            'export': options['export'],
+            'hedged': options['hedge'] and len(names) == 1,
+        }
+        key = hashlib.sha1(json.dumps([names, params], ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+        path = os.path.join(self.downloader.cache_dir, 'jobs', f'gui-{key[:16]}.jsonl')
+        try:
+            return JobJournal(path, resume=options['resume'], params=params)
+        except JournalMismatch:
+            return JobJournal(path, resume=False, params=params)
+
+    def download_task(self, names, options):
+        """在工作线程中运行；界面更新都通过 self.events 交给主线程"""
+        journal = self.job_journal(names, options)
+        self.downloader.metrics.reset()
+        finished = False
+        try:
+            finished = self.run_download(names, journal, options)
+        finally:
+            journal.close()
+            # 所有名称都已完成（没有因网络原因待重试的）时不再需要续传
+            if finished and all(journal.completed(name) for name in names):
+                try:
+                    os.remove(journal.path)
+                except OSError:
+                    pass
+            # 本次下载各阶段的耗时和各服务的计数
+            self.downloader.metrics.export(os.path.join(self.downloader.cache_dir, 'metrics.json'))
+
+    def run_download(self, names, journal, options):
         total = len(names)
         progress_step = 100.0 / total
-        selected_services = self.get_selected_services()
+        selected_services = options['services']
         
         for i, name in enumerate(names):
             # 检查是否停止下载
             if not self.is_downloading:
-                self.output_text.insert(tk.END, "\n下载已停止\n")
-                self.output_text.see(tk.END)
+                self.log("\n下载已停止\n")
                 return
                 
-            self.output_text.insert(tk.END, f"\n正在处理 {name}...\n")
-            self.output_text.see(tk.END)
+            done = journal.completed(name)
+            if done:
+                self.log(f"\n✓ {name} 上次已完成，跳过\n")
+                self.last_results.extend(done['icons'])
+                self.events.post('results', name, done['icons'])
+                self.events.post('progress', (i + 1) * progress_step)
+                continue
+
+            self.log(f"\n正在处理 {name}...\n")
             
             # 获取域名
-            self.output_text.insert(tk.END, "正在查找域名...\n")
-            self.output_text.see(tk.END)
-            domain = self.downloader.get_domain_from_name(name)
+            self.log("正在查找域名...\n")
+            try:
+                domain = self.downloader.resolve_domain(name)
+            except Exception as e:
+                # 网络异常不记为完成，续传时重新查找
+                self.log(f"✗ 查找 {name} 的域名失败: {str(e)}\n")
+                continue
             
             if not domain:
-                self.output_text.insert(tk.END, f"✗ 未找到 {name} 对应的域名，跳过下载\n")
-                self.output_text.see(tk.END)
+                self.log(f"✗ 未找到 {name} 对应的域名，跳过下载\n")
+                journal.record_name({'name': name, 'domain': None, 'error': '未找到对应的域名', 'icons': []})
                 continue
             
             # 检查是否停止下载
             if not self.is_downloading:
-                self.output_text.insert(tk.END, "\n下载已停止\n")
-                self.output_text.see(tk.END)
+                self.log("\n下载已停止\n")
                 return
                 
-            self.output_text.insert(tk.END, f"✓ 已找到域名: {domain}\n")
-            self.output_text.see(tk.END)
+            self.log(f"✓ 已找到域名: {domain}\n")
             
             # 下载图标
-            self.output_text.insert(tk.END, "正在从选中的服务下载图标...\n")
-            self.output_text.see(tk.END)
+            self.log("正在从选中的服务下载图标...\n")
             
-            size = int(self.size_var.get())
+            size = options['size']
             service_results = []
+            # 因网络原因没能问到的来源；有的话该名称不记为完成，续传时重试这些来源
+            failures = []
+
+            # 单个名称：对冲请求选中的在线服务，拿到所选尺寸的图标就不再请求其他服务
+            hedged = options['hedge'] and total == 1
+            if hedged and self.is_downloading:
+                service_results = self.downloader.download_hedged(
+                    domain, size, selected_services, should_abort=lambda: not self.is_downloading, failures=failures)
+                for result in service_results:
+                    journal.record_service(name, domain, result['service'], result)
             
             # 从选中的服务下载
-            if "Google Favicon" in selected_services and self.is_downloading:
-                result = self.downloader.download_google_favicon(domain, size)
-                if result:
-                    service_results.append({
-                        'service': 'Google Favicon',
-                        'filepath': result,
-                        'size': size
-                    })
+            if "Google Favicon" in selected_services and not hedged and self.is_downloading:
+                done = journal.service_result(name, 'Google Favicon')
+                if done:
+                    service_results.append(done)
+                else:
+                    saved = self.downloader.download_google_favicon(domain, size, failures)
+                    result = None
+                    if saved:
+                        filepath, target_size, original_size = saved
+                        result = {'service': 'Google Favicon', 'filepath': filepath, 'size': target_size,
+                                  'original_size': original_size}
+                    journal.record_service(name, domain, 'Google Favicon', result)
+                    if result:
+                        service_results.append(result)
             
             # 其他选中的在线服务
             online_services = {
-                "DuckDuckGo": f"https://icons.duckduckgo.com/ip3/{domain}.ico",
-                "Yandex": f"https://favicon.yandex.net/favicon/{domain}",
-                "ico.kucat.cn": f"https://ico.kucat.cn/get.php?url={domain}"
+                service_name: self.downloader.endpoints[service_name].format(domain=domain, size=size)
+                for service_name in ("DuckDuckGo", "Yandex", "ico.kucat.cn")
             }
             
-            for service_name in selected_services:
+            # 快而可靠的服务先请求，断路器断开的服务排在最后
+            for service_name in ([] if hedged else
+                                 self.downloader.health.order([s for s in selected_services if s in online_services])):
                 # 检查是否停止下载
                 if not self.is_downloading:
-                    self.output_text.insert(tk.END, "\n下载已停止\n")
-                    self.output_text.see(tk.END)
+                    self.log("\n下载已停止\n")
                     return
                     
                 if service_name in online_services:
+                    done = journal.service_result(name, service_name)
+                    if done:
+                        service_results.append(done)
+                        continue
                     success = False
+                    unavailable = False
                     retry_count = 0
                     max_retries = 3
                     
                     while not success and retry_count < max_retries and self.is_downloading:
+                        if retry_count and not self.wait_retry(retry_count):
+                            break
+                        # 只有服务暂时不可用（超时、连接错误、5xx、429）才重试，404 等明确的回答不重试
+                        retryable = False
                         try:
-                            response = self.session.get(
+                            # 经过下载器的限速器和该服务的断路器：服务持续失败时不再请求，也不再重试；
+                            # 一个名称只计一次失败，重试失败不会让断路器断开
+                            response = self.downloader.service_get(
+                                service_name,
                                 online_services[service_name],
-                                headers=self.downloader.headers,
-                                timeout=(5, 15)  # 增加超时时间
+                                timeout=(5, 15),  # 增加超时时间
+                                cached=False,
+                                retry=retry_count > 0
                             )
+                            unavailable = response.status_code >= 500 or response.status_code == 429
                             if response.status_code == 200:
                                 try:
-                                    img = Image.open(BytesIO(response.content))
-                                    if max(img.size) >= 16:  # 确保图标不是空的
-                                        # 获取原始尺寸
-                                        original_size = max(img.size)
-                                        
-                                        # 如果原始尺寸大于目标尺寸，保持原始尺寸
-                                        target_size = max(size, original_size)
-                                        
-                                        filename = f"{self.downloader.clean_filename(domain)}_{service_name}_{target_size}.png"
-                                        filepath = os.path.join(self.downloader.output_dir, filename)
-                                        
-                                        # 只有当原始尺寸小于目标尺寸时才进行放大
-                                        if img.size != (target_size, target_size):
-                                            img = img.resize((target_size, target_size), Image.Resampling.LANCZOS)
-                                        
-                                        # 转换为 RGBA 模式以确保透明度
-                                        if img.mode != 'RGBA':
-                                            img = img.convert('RGBA')
-                                            
-                                        img.save(filepath, "PNG")
-                                        
+                                    # 解码、缩放和编码在下载器的图片流水线中完成
+                                    saved = self.downloader.save_icon(response.content, domain, service_name, size)
+                                    if saved:
+                                        filepath, target_size, original_size = saved
                                         service_results.append({
                                             'service': service_name,
                                             'filepath': filepath,
-                                            'size': target_size
+                                            'size': target_size,
+                                            'original_size': original_size
                                         })
                                         success = True
                                 except Exception as e:
-                                    self.output_text.insert(tk.END, f"✗ {service_name} 图标处理失败: {str(e)}\n")
+                                    self.log(f"✗ {service_name} 图标处理失败: {str(e)}\n")
                             else:
-                                self.output_text.insert(tk.END, f"✗ {service_name} 返回状态码: {response.status_code}\n")
+                                self.log(f"✗ {service_name} 返回状态码: {response.status_code}\n")
+                                retryable = unavailable
+                        except CircuitOpen:
+                            self.log(f"✗ {service_name} 暂时不可用（连续失败，已暂停使用），跳过\n")
+                            unavailable = True
+                            break
                         except requests.exceptions.Timeout:
-                            self.output_text.insert(tk.END, f"✗ {service_name} 请求超时，正在重试...\n")
+                            self.log(f"✗ {service_name} 请求超时\n")
+                            unavailable = retryable = True
                         except requests.exceptions.ConnectionError:
-                            self.output_text.insert(tk.END, f"✗ {service_name} 连接错误，正在重试...\n")
+                            self.log(f"✗ {service_name} 连接错误\n")
+                            unavailable = retryable = True
                         except Exception as e:
-                            self.output_text.insert(tk.END, f"✗ {service_name} 下载失败: {str(e)}\n")
+                            self.log(f"✗ {service_name} 下载失败: {str(e)}\n")
                         
                         if not success:
                             retry_count += 1
-                            if retry_count < max_retries and self.is_downloading:
-                                time.sleep(1)  # 重试前等待1秒
+                            if not retryable:
+                                break
                     
-                    if not success:
-                        self.output_text.insert(tk.END, f"✗ {service_name} 在 {max_retries} 次尝试后仍然失败\n")
+                    if not success and retry_count:
+                        self.log(f"✗ {service_name} 在 {retry_count} 次尝试后仍然失败\n")
+                    if not success and unavailable:
+                        failures.append(service_name)
+                    if self.is_downloading:
+                        journal.record_service(name, domain, service_name, service_results[-1] if success else None)
                     
-                    self.output_text.see(tk.END)
             
             # 检查是否停止下载
             if not self.is_downloading:
-                self.output_text.insert(tk.END, "\n下载已停止\n")
-                self.output_text.see(tk.END)
+                self.log("\n下载已停止\n")
                 return
                 
-            # 直接从网站下载
-            if "直接从网站下载" in selected_services and self.is_downloading:
-                direct_result = self.downloader.download_direct_favicon(domain)
-                if direct_result:
-                    service_results.append({
-                        'service': '直接从网站下载',
-                        'filepath': direct_result,
-                        'size': size
-                    })
+            # 直接从网站下载（对冲请求已拿到所选尺寸的图标时不再需要）
+            if ("直接从网站下载" in selected_services and self.is_downloading
+                    and not (hedged and len(service_results) == 1
+                             and self.downloader.original_size(service_results[0]) >= size)):
+                done = journal.service_result(name, '直接从网站下载')
+                if done:
+                    service_results.append(done)
+                else:
+                    saved = self.downloader.download_direct_favicon(domain, size, failures=failures)
+                    direct_result = self.downloader.direct_result(saved, '直接从网站下载') if saved else None
+                    journal.record_service(name, domain, '直接从网站下载', direct_result)
+                    if direct_result:
+                        service_results.append(direct_result)
+
+            # 检查是否停止下载（中途停止的名称不记为完成，续传时重试）
+            if not self.is_downloading:
+                self.log("\n下载已停止\n")
+                return
             
             # 更新结果
             if service_results:
-                self.output_text.insert(tk.END, "\n下载结果:\n")
+                self.log("\n下载结果:\n")
                 for result in service_results:
-                    self.output_text.insert(tk.END, f"✓ 从 {result['service']} 下载的图标已保存: {result['filepath']}\n")
+                    self.log(f"✓ 从 {result['service']} 下载的图标已保存: {result['filepath']}\n")
+                self.last_results.extend(service_results)
+                self.events.post('results', name, service_results)
+                if self.downloader.storage_mode == 'native':
+                    self.show_derivatives(service_results, size)
+                if options['export']:
+                    exported = self.downloader.export_icon_set({'domain': domain, 'icons': service_results})
+                    if exported:
+                        self.log(f"✓ 图标集已导出: {exported['dir']}\n")
             else:
-                self.output_text.insert(tk.END, "✗ 未能从任何选中的服务下载到图标\n")
-            
-            self.output_text.see(tk.END)
+                self.log("✗ 未能从任何选中的服务下载到图标\n")
+            if not journal.record_name({'name': name, 'domain': domain, 'icons': service_results,
+                                        'failed_sources': failures}):
+                self.log(f"！{'、'.join(failures)} 因网络原因未能完成，续传时会重试\n")
             
             # 更新进度条
-            self.progress['value'] = (i + 1) * progress_step
-            self.root.update_idletasks()
+            self.events.post('progress', (i + 1) * progress_step)
         
+        self.downloader.icon_store.flush()
+        self.downloader.service_history.save()
+
         # 恢复界面状态
         self.is_downloading = False
+        self.events.post('finished')
+        return True
+
+    def wait_retry(self, attempt):
+        """第 attempt 次重试前按指数退避等待；等待期间停止下载时返回False"""
+        delay = backoff_delay(attempt)
+        self.log(f"  {delay:.1f} 秒后重试...\n")
+        deadline = time.monotonic() + delay
+        while self.is_downloading and time.monotonic() < deadline:
+            time.sleep(min(0.1, deadline - time.monotonic()))
+        return self.is_downloading
+
+    def log(self, text):
+        """可在任意线程调用，文本由主线程批量写入输出框"""
+        self.events.post('log', text)
+
+    def append_log(self, text):
+        """主线程：一次写入一批日志，只保留最近 MAX_LOG_LINES 行"""
+        self.output_text.insert(tk.END, text)
+        lines = int(self.output_text.index('end-1c').split('.')[0])
+        if lines > MAX_LOG_LINES:
+            self.output_text.delete('1.0', f'{lines - MAX_LOG_LINES + 1}.0')
+        self.output_text.see(tk.END)
+
+    def add_results(self, name, results):
+        """主线程：把一个名称的下载结果加入预览"""
+        self.gallery.add([(f"{name}\n{result['service']}", result['filepath']) for result in results])
+
+    def set_progress(self, value):
+        self.progress['value'] = value
+
+    def on_finished(self):
+        """主线程：下载结束后恢复界面"""
         self.download_button.config(text="开始下载")
         self.download_button.configure(bootstyle="success")
         self.input_text.config(state='normal')
         self.status_label.config(text="下载完成")
-        
-        if total > 0:
-            messagebox.showinfo("完成", "所有图标下载完成！", font=self.default_font)
-        
+        messagebox.showinfo("完成", "所有图标下载完成！", font=self.default_font)
+        
+    def show_derivatives(self, results, size):
+        """原始尺寸模式下，列出所选尺寸的派生图路径"""
+        for result in results:
+            try:
+                path = self.downloader.serve_icon(result['filepath'], size)
+                self.log(f"  {size}x{size}: {path}\n")
+            except Exception as e:
+                self.log(f"✗ 生成 {size}x{size} 版本失败: {str(e)}\n")
+
+    def on_size_changed(self, *args):
+        """原始尺寸模式下切换尺寸时，只需提供对应的派生图，不必重新下载"""
+        if self.is_downloading or not self.last_results or self.downloader.storage_mode != 'native':
+            return
+        size = int(self.size_var.get())
+        self.log(f"\n切换到 {size}x{size}:\n")
+        self.show_derivatives(self.last_results, size)
+
     def open_output_folder(self):
+        if self.downloader is None:
+            return
         output_dir = self.downloader.output_dir
         if os.path.exists(output_dir):
             os.startfile(output_dir)
@@ -513,8 +753,12 @@ class ToolTip:
             self.tooltip = None
 
 def main():
+    # 打包后的程序使用进程池处理图片时需要
+    multiprocessing.freeze_support()
+    startup.mark('模块导入')
     root = ttk.Window(themename="litera")
     app = IconDownloaderGUI(root)
+    startup.mark('界面创建')
     root.mainloop()
 
 if __name__ == "__main__":
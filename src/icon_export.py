@@ -0,0 +1,81 @@
+import os
+
+from lazy_import import lazy_module
+
+# PIL 在第一次导出时才导入
+Image = lazy_module('PIL.Image')
+
+# 导出图标集的默认尺寸，ICO 最大支持 256
+DEFAULT_SIZES = (16, 24, 32, 48, 64, 128, 256, 512)
+ICO_MAX_SIZE = 256
+
+
+def square(img):
+    """转换为RGBA并居中补齐为正方形（不拉伸）"""
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    if img.width == img.height:
+        return img
+    side = max(img.size)
+    canvas = Image.new('RGBA', (side, side), (0, 0, 0, 0))
+    canvas.paste(img, ((side - img.width) // 2, (side - img.height) // 2))
+    return canvas
+
+
+def size_ladder(img, sizes=DEFAULT_SIZES, upscale=False):
+    """从一张原图逐级缩小生成多个尺寸，返回 {尺寸: 图像}
+
+    从大到小依次处理，每一级都从上一级的结果缩小，而不是每个尺寸都从原图单独缩放；
+    跨度超过一半时先用 reduce 做整数倍盒式缩小，再用 LANCZOS 精确到目标尺寸。
+    upscale=False 时跳过比原图还大的尺寸。
+    """
+    current = square(img)
+    frames = {}
+    for size in sorted(set(sizes), reverse=True):
+        if size > current.width and not upscale:
+            continue
+        if current.width >= size * 2:
+            current = current.reduce(current.width // size)
+        if current.size != (size, size):
+            current = current.resize((size, size), Image.Resampling.LANCZOS)
+        frames[size] = current
+    return frames
+
+
+def save_ico(frames, path):
+    """把 {尺寸: 图像} 中不超过256的帧写入同一个ICO文件"""
+    ico_frames = [frames[size] for size in sorted(frames, reverse=True) if size <= ICO_MAX_SIZE]
+    if not ico_frames:
+        return None
+    ico_frames[0].save(path, format='ICO',
+                       sizes=[frame.size for frame in ico_frames],
+                       append_images=ico_frames[1:])
+    return path
+
+
+def export_icon_set(source_path, out_dir, basename, sizes=DEFAULT_SIZES, formats=('ico', 'png'), upscale=False):
+    """从一张原图一次性导出完整图标集
+
+    formats 可包含 'ico'（所有帧写入一个文件）、'png'、'webp'（每个尺寸一个文件）。
+    可在进程池中执行，返回 {'dir': 输出目录, 'ico': 路径, 'png': {尺寸: 路径}, 'webp': {尺寸: 路径}}。
+    """
+    with Image.open(source_path) as img:
+        img.load()
+        frames = size_ladder(img, sizes, upscale)
+    os.makedirs(out_dir, exist_ok=True)
+
+    exported = {'dir': out_dir}
+    if 'ico' in formats:
+        exported['ico'] = save_ico(frames, os.path.join(out_dir, f"{basename}.ico"))
+    for fmt in ('png', 'webp'):
+        if fmt not in formats:
+            continue
+        exported[fmt] = {}
+        for size, frame in sorted(frames.items()):
+            path = os.path.join(out_dir, f"{basename}_{size}.{fmt}")
+            if fmt == 'webp':
+                frame.save(path, 'WEBP', lossless=True)
+            else:
+                frame.save(path, 'PNG')
+            exported[fmt][size] = path
+    return exported
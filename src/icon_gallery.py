@@ -0,0 +1,131 @@
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+
+from lazy_import import lazy_module
+from lru import LRUCache
+
+# 第一次生成缩略图时才导入 PIL
+Image = lazy_module('PIL.Image')
+ImageTk = lazy_module('PIL.ImageTk')
+
+
+class IconGallery(tk.Frame):
+    """下载结果的缩略图列表，只为可见的行生成缩略图
+
+    每次滚动或改变大小时只绘制可见的几行；缩略图在后台线程中用 PIL 生成，
+    经 EventPump 的 'thumbnail' 事件交回主线程后才创建 ImageTk.PhotoImage（Tk 对象只能在主线程创建）。
+    PhotoImage 保存在有上限的 LRU 中，浏览上万个图标时内存保持平稳。
+    """
+
+    def __init__(self, parent, events, thumb_size=64, cache_size=512, workers=2, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.events = events
+        self.thumb_size = thumb_size
+        self.cell_width = thumb_size + 56
+        self.cell_height = thumb_size + 40
+        self.items = []
+        self.photos = LRUCache(maxsize=cache_size)
+        self._wanted = frozenset()
+        self._pending = set()
+        self._failed = set()
+        self._redraw_scheduled = False
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='icon-thumb')
+
+        self.canvas = tk.Canvas(self, highlightthickness=0, background='white')
+        scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scroll)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.canvas.bind('<Configure>', lambda event: self.redraw())
+        self.canvas.bind('<MouseWheel>', self._on_wheel)
+        self.canvas.bind('<Button-4>', lambda event: self._on_scroll('scroll', -1, 'units'))
+        self.canvas.bind('<Button-5>', lambda event: self._on_scroll('scroll', 1, 'units'))
+        self.canvas.configure(yscrollincrement=self.cell_height // 2)
+        events.on('thumbnail', self._on_thumbnail)
+
+    def add(self, items):
+        """追加 (标题, 文件路径) 列表"""
+        self.items.extend(items)
+        self.redraw()
+
+    def clear(self):
+        self.items = []
+        self._failed.clear()
+        self.canvas.yview_moveto(0)
+        self.redraw()
+
+    def _columns(self):
+        return max(1, self.canvas.winfo_width() // self.cell_width)
+
+    def _on_scroll(self, *args):
+        self.canvas.yview(*args)
+        self.redraw()
+
+    def _on_wheel(self, event):
+        self._on_scroll('scroll', -1 if event.delta > 0 else 1, 'units')
+
+    def redraw(self):
+        """只绘制可见区域内的格子，缺少缩略图的提交后台生成"""
+        columns = self._columns()
+        rows = (len(self.items) + columns - 1) // columns
+        width = self.canvas.winfo_width()
+        self.canvas.configure(scrollregion=(0, 0, width, max(rows * self.cell_height, 1)))
+        self.canvas.delete('all')
+
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first_row = max(0, int(top // self.cell_height))
+        last_row = min(rows, int(bottom // self.cell_height) + 1)
+        wanted = set()
+        for index in range(first_row * columns, min(len(self.items), last_row * columns)):
+            title, path = self.items[index]
+            row, column = divmod(index, columns)
+            x = column * self.cell_width + self.cell_width // 2
+            y = row * self.cell_height + 4
+            photo = self.photos.get(path)
+            if photo is not None:
+                self.canvas.create_image(x, y, image=photo, anchor=tk.N)
+            else:
+                half = self.thumb_size // 2
+                self.canvas.create_rectangle(x - half, y, x + half, y + self.thumb_size, outline='#dddddd')
+                wanted.add(path)
+            self.canvas.create_text(x, y + self.thumb_size + 4, text=title, anchor=tk.N,
+                                    width=self.cell_width - 8, font=('Microsoft YaHei UI', 8))
+        # 滚出可见区域的请求在后台开始前会被跳过
+        self._wanted = frozenset(wanted)
+        for path in wanted - self._pending - self._failed:
+            self._pending.add(path)
+            self._pool.submit(self._build_thumbnail, path)
+
+    def _build_thumbnail(self, path):
+        """后台线程：读取并缩小图片，结果交回主线程；已不可见时跳过（None），失败为False"""
+        image = None
+        if path in self._wanted:
+            try:
+                with Image.open(path) as img:
+                    img.thumbnail((self.thumb_size, self.thumb_size), Image.Resampling.LANCZOS)
+                    image = img.convert('RGBA')
+            except Exception as e:
+                print(f"生成缩略图失败 {path}: {str(e)}")
+                image = False
+        self.events.post('thumbnail', path, image)
+
+    def _on_thumbnail(self, path, image):
+        self._pending.discard(path)
+        if image is False:
+            self._failed.add(path)
+            return
+        if image is None:
+            return
+        self.photos.put(path, ImageTk.PhotoImage(image))
+        if path in self._wanted and not self._redraw_scheduled:
+            # 同一批到达的缩略图只重绘一次
+            self._redraw_scheduled = True
+            self.after_idle(self._scheduled_redraw)
+
+    def _scheduled_redraw(self):
+        self._redraw_scheduled = False
+        self.redraw()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
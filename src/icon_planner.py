@@ -0,0 +1,164 @@
+import os
+import re
+import json
+import threading
+from collections import namedtuple
+from urllib.parse import urljoin
+
+
+IconCandidate = namedtuple('IconCandidate', ['url', 'size', 'source'])
+
+ICON_RELS = {'icon', 'shortcut icon', 'apple-touch-icon', 'apple-touch-icon-precomposed', 'fluid-icon', 'mask-icon'}
+
+# 常见图标路径及其惯例尺寸（0 表示无法预知）
+CONVENTION_PATHS = [
+    ("/apple-touch-icon.png", 180),
+    ("/apple-touch-icon-precomposed.png", 180),
+    ("/apple-touch-icon-180x180.png", 180),
+    ("/apple-touch-icon-152x152.png", 152),
+    ("/apple-touch-icon-120x120.png", 120),
+    ("/touch-icon-iphone.png", 120),
+    ("/favicon.ico", 32),
+    ("/favicon.png", 32),
+    ("/icon.png", 0),
+    ("/logo.png", 0),
+]
+
+_SIZE_PATTERN = re.compile(r'(\d+)x(\d+)', re.IGNORECASE)
+
+
+def parse_sizes(value):
+    """解析 sizes 属性（如 "16x16 32x32"），返回最大边长；"any" 或无法解析返回0"""
+    sizes = [max(int(w), int(h)) for w, h in _SIZE_PATTERN.findall(value or '')]
+    return max(sizes) if sizes else 0
+
+
+def is_raster(url, mime=None):
+    """SVG 无法由 PIL 解码，不作为候选"""
+    if mime and 'svg' in mime.lower():
+        return False
+    return not url.lower().split('?')[0].endswith('.svg')
+
+
+def link_candidates(base_url, links):
+    """由 <link> 属性列表生成候选：尺寸优先取 sizes，其次取链接中的 NxN，apple-touch-icon 默认180"""
+    candidates = []
+    manifest_url = None
+    for attrs in links:
+        rel = attrs.get('rel') or ''
+        if isinstance(rel, (list, tuple)):
+            rel = ' '.join(rel)
+        rel = rel.lower().strip()
+        href = attrs.get('href')
+        if not href:
+            continue
+        if rel == 'manifest':
+            manifest_url = urljoin(base_url, href)
+            continue
+        if rel not in ICON_RELS and not any(r in ICON_RELS for r in rel.split()):
+            continue
+        url = urljoin(base_url, href)
+        if not is_raster(url, attrs.get('type')):
+            continue
+        size = parse_sizes(attrs.get('sizes')) or parse_sizes(href)
+        if not size and rel.startswith('apple-touch-icon'):
+            size = 180
+        candidates.append(IconCandidate(url, size, 'link'))
+    return candidates, manifest_url
+
+
+def manifest_candidates(manifest_url, text):
+    """解析 Web App Manifest 中的 icons 列表"""
+    try:
+        manifest = json.loads(text)
+    except ValueError:
+        return []
+    candidates = []
+    for icon in manifest.get('icons') or []:
+        if not isinstance(icon, dict) or not icon.get('src'):
+            continue
+        url = urljoin(manifest_url, icon['src'])
+        if is_raster(url, icon.get('type')):
+            candidates.append(IconCandidate(url, parse_sizes(icon.get('sizes')), 'manifest'))
+    return candidates
+
+
+def convention_candidates(base_urls):
+    return [IconCandidate(base_url + path, size, 'convention')
+            for base_url in base_urls for path, size in CONVENTION_PATHS]
+
+
+def plan(candidates, target_size, min_size=32):
+    """按预期质量排序候选，去掉重复和已知太小的
+
+    已知达到目标尺寸的排在最前（其中尺寸最接近目标的优先，下载量最小），
+    其次是已知尺寸不够但可用的（大的优先），最后是尺寸未知的。
+    """
+    unique = {}
+    for candidate in candidates:
+        if candidate.size and candidate.size < min_size:
+            continue
+        known = unique.get(candidate.url)
+        if known is None or candidate.size > known.size:
+            unique[candidate.url] = candidate
+
+    def rank(candidate):
+        if candidate.size >= target_size:
+            return (0, candidate.size)
+        if candidate.size:
+            return (1, -candidate.size)
+        return (2, 0)
+
+    return sorted(unique.values(), key=rank)
+
+
+class ServiceHistory:
+    """记录各图标服务过去返回图标的情况，用于在下载前排序
+
+    得分 = 成功率 × min(平均原始尺寸 / 目标尺寸, 1)，没有记录的服务得中等分数。
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.stats = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.stats = json.load(f)
+            except Exception as e:
+                print(f"Warning: Failed to load {path}: {e}")
+
+    def record(self, service, original_size):
+        """记录一次请求结果，original_size 为 None 表示没拿到可用图标"""
+        with self._lock:
+            stat = self.stats.setdefault(service, {'attempts': 0, 'successes': 0, 'total_size': 0})
+            stat['attempts'] += 1
+            if original_size:
+                stat['successes'] += 1
+                stat['total_size'] += original_size
+
+    def score(self, service, target_size):
+        stat = self.stats.get(service)
+        if not stat or not stat['attempts']:
+            return 0.5
+        if not stat['successes']:
+            return 0.0
+        success_rate = stat['successes'] / stat['attempts']
+        average_size = stat['total_size'] / stat['successes']
+        return success_rate * min(average_size / target_size, 1.0)
+
+    def order(self, services, target_size):
+        """按得分从高到低排序服务名（得分相同保持原顺序）"""
+        return sorted(services, key=lambda service: -self.score(service, target_size))
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps(self.stats, ensure_ascii=False, indent=2)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,292 @@
+import os
+import sys
+import json
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, urlsplit, parse_qs, urlencode
+
+from icon_downloader import IconDownloader
+from job_journal import JobJournal, JournalMismatch
+from lru import LRUCache
+from mapping_index import find_resource
+
+
+# 下载时的目标尺寸：图标按原始尺寸保存，各尺寸由派生图提供，因此不按单次请求的尺寸下载
+DOWNLOAD_SIZE = 256
+# index.html 由本服务提供时注入，页面据此改用本地接口
+INDEX_HOOK = b'<script>window.ICON_API = "/api";</script>'
+# 始终接受的 Host：本机地址
+LOCAL_HOSTS = {'127.0.0.1', 'localhost', '::1'}
+
+
+class IconService:
+    """本地图标服务：所有客户端共享一份热缓存
+
+    内存中是两层LRU（名称→域名、(域名, 尺寸)→PNG字节），下面是磁盘缓存：
+    域名缓存（SQLite）、图标服务响应缓存、按原始尺寸保存的图标和派生图，以及记录每个域名下载结果的作业日志，
+    因此重启后也不必重新访问网络。相同的请求同时到达时只处理一次。
+    """
+
+    def __init__(self, downloader, cache_bytes=64 * 1024 * 1024, strategy='best'):
+        self.downloader = downloader
+        self.strategy = strategy
+        self.domains = LRUCache(maxsize=10000)
+        self.icons = LRUCache(maxsize=100000, max_weight=cache_bytes, weigh=len)
+        journal_path = os.path.join(downloader.cache_dir, 'jobs', 'server.jsonl')
+        params = downloader.job_params(DOWNLOAD_SIZE, strategy)
+        try:
+            self.journal = JobJournal(journal_path, resume=True, params=params)
+        except JournalMismatch as e:
+            # 日志只是下载结果的缓存，参数改变后重新开始
+            print(f"{e}，重新开始")
+            self.journal = JobJournal(journal_path, resume=False, params=params)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _once(self, key, compute):
+        """同一个 key 同时只计算一次，其余请求等待同一个结果"""
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def resolve(self, name):
+        """名称 → 域名，找不到返回None
+
+        只缓存找到的域名：“找不到”可能是暂时的网络错误，确认不存在的名称已由域名缓存（SQLite）记录。
+        """
+        name = name.strip()
+        domain = self.domains.get(name)
+        if domain is None:
+            domain = self._once(('resolve', name), lambda: self.downloader.get_domain_from_name(name))
+            if domain:
+                self.domains.put(name, domain)
+        return domain or None
+
+    def download(self, domain):
+        """域名的下载结果，先查作业日志，没有再下载；只记录下载到图标的结果，没有图标的下次再试"""
+        def compute():
+            result = self.journal.completed(domain)
+            if result is None or not result['icons']:
+                result = self.downloader.download_one(domain, DOWNLOAD_SIZE, strategy=self.strategy, journal=self.journal)
+                if result['icons']:
+                    self.journal.record_name(result)
+                self.downloader.icon_store.flush()
+            return result
+        return self._once(('download', domain), compute)
+
+    def icon(self, domain, size, service=None):
+        """返回 size×size 的PNG字节，没有图标返回None"""
+        key = (domain, size, service)
+        data = self.icons.get(key)
+        if data is not None:
+            return data
+        icons = self.download(domain)['icons']
+        if service:
+            icons = [icon for icon in icons if icon['service'] == service]
+        best = self.downloader.best_icon(icons)
+        if best is None:
+            return None
+        path = self.downloader.serve_icon(best['filepath'], size)
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.icons.put(key, data)
+        return data
+
+    def stats(self):
+        return {
+            'domains': self.domains.stats(),
+            'icons': self.icons.stats(),
+            'domain_cache': self.downloader.domain_cache.stats(),
+            'http_cache': self.downloader.http_cache.stats(),
+            'derivatives': self.downloader.derivatives.stats(),
+            'services': self.downloader.health.snapshot(),
+        }
+
+    def close(self):
+        self.journal.close()
+        self.downloader.icon_store.flush()
+        self.downloader.service_history.save()
+        self.downloader.image_pipeline.shutdown()
+
+
+class IconRequestHandler(BaseHTTPRequestHandler):
+    """接口：
+      GET /api/resolve?q=名称                  → {"name", "domain"}
+      GET /api/icon?q=名称或域名&size=256[&service=服务名] → image/png
+      GET /api/icons?q=名称或域名&size=256      → {"name", "domain", "icons": [{"service", "url"}]}
+      GET /api/stats                           → 缓存统计和各图标服务的健康状况
+      GET /metrics                             → 各阶段耗时和各服务计数（Prometheus 文本格式）
+      GET /                                    → index.html（启用时）
+
+    不发送 CORS 头，页面与接口同源；Host 不是本机或 --allow-host 指定的主机名时拒绝（防止 DNS 重绑定），
+    带 Origin 的请求只接受来自本服务自身的，其他网站不能借用户的浏览器让本服务去下载。
+    """
+
+    service = None
+    index_path = None
+    allowed_hosts = LOCAL_HOSTS
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} {format % args}")
+
+    def send_body(self, status, body, content_type, cache_seconds=0):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if cache_seconds:
+            self.send_header('Cache-Control', f'public, max-age={cache_seconds}')
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def send_json(self, status, data):
+        self.send_body(status, json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8')
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def request_allowed(self):
+        """Host 是允许的主机名，且没有 Origin 或 Origin 就是本服务"""
+        host = self.headers.get('Host', '')
+        try:
+            hostname = urlsplit(f'//{host}').hostname
+        except ValueError:
+            return False
+        if hostname not in self.allowed_hosts:
+            return False
+        origin = self.headers.get('Origin')
+        return origin is None or urlsplit(origin).netloc.lower() == host.lower()
+
+    def do_GET(self):
+        if not self.request_allowed():
+            self.send_json(403, {'error': '只接受来自本机页面的请求'})
+            return
+        parsed = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        routes = {
+            '/api/resolve': self.handle_resolve,
+            '/api/icon': self.handle_icon,
+            '/api/icons': self.handle_icons,
+            '/api/stats': lambda params: self.send_json(200, self.service.stats()),
+            '/metrics': self.handle_metrics,
+        }
+        try:
+            if parsed.path in routes:
+                routes[parsed.path](params)
+            elif parsed.path in ('/', '/index.html') and self.index_path:
+                self.handle_index()
+            else:
+                self.send_json(404, {'error': '不存在的接口'})
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+
+    def query_domain(self, params):
+        name = (params.get('q') or params.get('domain') or '').strip()
+        if not name:
+            raise ValueError('缺少参数 q')
+        return name, self.service.resolve(name)
+
+    def query_size(self, params):
+        size = int(params.get('size', 256))
+        if not 1 <= size <= 1024:
+            raise ValueError('size 必须在 1~1024 之间')
+        return size
+
+    def handle_resolve(self, params):
+        name, domain = self.query_domain(params)
+        if not domain:
+            self.send_json(404, {'name': name, 'domain': None, 'error': '未找到对应的域名'})
+        else:
+            self.send_json(200, {'name': name, 'domain': domain})
+
+    def handle_icon(self, params):
+        size = self.query_size(params)
+        name, domain = self.query_domain(params)
+        data = self.service.icon(domain, size, params.get('service')) if domain else None
+        if data is None:
+            self.send_json(404, {'name': name, 'domain': domain, 'error': '未能下载到图标'})
+        else:
+            self.send_body(200, data, 'image/png', cache_seconds=86400)
+
+    def handle_icons(self, params):
+        size = self.query_size(params)
+        name, domain = self.query_domain(params)
+        if not domain:
+            self.send_json(404, {'name': name, 'domain': None, 'error': '未找到对应的域名'})
+            return
+        icons = self.service.download(domain)['icons']
+        self.send_json(200, {
+            'name': name,
+            'domain': domain,
+            'icons': [{'service': icon['service'],
+                       'url': '/api/icon?' + urlencode({'q': domain, 'size': size, 'service': icon['service']})}
+                      for icon in icons]
+        })
+
+    def handle_metrics(self, params):
+        body = self.service.downloader.metrics.prometheus().encode('utf-8')
+        self.send_body(200, body, 'text/plain; version=0.0.4; charset=utf-8')
+
+    def handle_index(self):
+        with open(self.index_path, 'rb') as f:
+            html = f.read()
+        html = html.replace(b'</head>', INDEX_HOOK + b'\n</head>', 1)
+        self.send_body(200, html, 'text/html; charset=utf-8')
+
+
+def main(argv=None):
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="本地图标服务，为 index.html 和其他客户端提供域名解析和图标接口")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址（默认 127.0.0.1）")
+    parser.add_argument('--port', type=int, default=8000, help="监听端口（默认 8000）")
+    parser.add_argument('--cache-mb', type=int, default=64, help="内存中图标缓存的大小（MB，默认 64）")
+    parser.add_argument('--strategy', choices=('all', 'best', 'hedged'), default='best',
+                        help="下载策略，见 icon_cli --strategy（默认 best）")
+    parser.add_argument('--no-index', action='store_true', help="不提供 index.html 页面")
+    parser.add_argument('--allow-host', action='append', default=[], metavar='HOST',
+                        help="除本机地址外允许的 Host 主机名（监听其他地址时使用），可重复")
+    args = parser.parse_args(argv)
+
+    downloader = IconDownloader(storage_mode='native')
+    IconRequestHandler.service = IconService(downloader, args.cache_mb * 1024 * 1024, args.strategy)
+    IconRequestHandler.index_path = None if args.no_index else find_resource('index.html')
+    allowed = {host.lower() for host in args.allow_host}
+    if args.host not in ('', '0.0.0.0', '::'):
+        allowed.add(args.host.lower())
+    IconRequestHandler.allowed_hosts = LOCAL_HOSTS | allowed
+
+    server = ThreadingHTTPServer((args.host, args.port), IconRequestHandler)
+    server.daemon_threads = True
+    print(f"图标服务已启动: http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        IconRequestHandler.service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+
+def pixel_hash(img):
+    """解码后像素的哈希（统一为RGBA，包含尺寸），与文件编码方式无关"""
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    digest = hashlib.sha256(f"{img.width}x{img.height}:".encode())
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def blob_path(blob_dir, digest):
+    return os.path.join(blob_dir, f"{digest}.png")
+
+
+def write_blob(blob_dir, img):
+    """按像素哈希写入PNG数据文件，已存在时跳过编码；返回 (哈希, 是否新写入)
+
+    可以在其他进程中调用，写入先落到临时文件再原子替换。
+    """
+    digest = pixel_hash(img)
+    path = blob_path(blob_dir, digest)
+    if os.path.exists(path):
+        return digest, False
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    img.save(tmp_path, "PNG")
+    os.replace(tmp_path, path)
+    return digest, True
+
+
+class IconStore:
+    """下载结果的保存层，按解码后的像素去重
+
+    每张图片先计算像素哈希，相同像素只编码、写入一次，存放在 .blobs/ 下；
+    输出目录中的 {域名}_{服务}_{尺寸}.png 以硬链接指向这份数据
+    （link_mode='index' 时不再生成重复文件，只记录在清单里）。
+    manifest.json 记录每份数据由哪些域名/服务返回、对应哪些文件。
+    """
+
+    def __init__(self, output_dir, link_mode='hardlink', flush_every=50):
+        self.output_dir = output_dir
+        self.blob_dir = os.path.join(output_dir, '.blobs')
+        self.manifest_path = os.path.join(output_dir, 'manifest.json')
+        self.link_mode = link_mode
+        self.flush_every = flush_every
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if isinstance(manifest, dict):
+                manifest.setdefault('blobs', {})
+                manifest.setdefault('files', {})
+                return manifest
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Warning: Failed to load {self.manifest_path}: {e}")
+        return {'blobs': {}, 'files': {}}
+
+    def blob_path(self, digest):
+        return blob_path(self.blob_dir, digest)
+
+    def _link(self, source, filepath):
+        """把输出文件指向数据文件：优先硬链接，不支持时退回复制"""
+        if os.path.exists(filepath):
+            if os.path.samefile(source, filepath):
+                return
+            os.remove(filepath)
+        try:
+            os.link(source, filepath)
+        except OSError:
+            shutil.copyfile(source, filepath)
+
+    def save(self, img, filename, domain=None, service=None):
+        """保存图片并返回文件路径；相同像素的图片只写一次"""
+        digest, created = write_blob(self.blob_dir, img)
+        return self.link(digest, img.size, filename, domain, service, created)
+
+    def link(self, digest, size, filename, domain=None, service=None, created=False):
+        """为已写入的数据文件生成输出文件并登记到清单，返回文件路径"""
+        path = self.blob_path(digest)
+        if self.link_mode == 'index' and not created:
+            filepath = path
+        else:
+            filepath = os.path.join(self.output_dir, filename)
+            self._link(path, filepath)
+
+        self._record(digest, size, filename, domain, service)
+        return filepath
+
+    def digest_of(self, filename):
+        """输出文件对应的像素哈希，未登记返回None"""
+        with self._lock:
+            return self.manifest['files'].get(filename)
+
+    def _record(self, digest, size, filename, domain, service):
+        with self._lock:
+            files = self.manifest['files']
+            old_digest = files.get(filename)
+            if old_digest and old_digest != digest and old_digest in self.manifest['blobs']:
+                old = self.manifest['blobs'][old_digest]
+                old['sources'] = [s for s in old['sources'] if s.get('file') != filename]
+            files[filename] = digest
+
+            blob = self.manifest['blobs'].setdefault(digest, {
+                'width': size[0],
+                'height': size[1],
+                'path': os.path.relpath(self.blob_path(digest), self.output_dir),
+                'sources': []
+            })
+            source = {'domain': domain, 'service': service, 'file': filename}
+            if source not in blob['sources']:
+                blob['sources'].append(source)
+
+            self._dirty += 1
+            if self._dirty >= self.flush_every:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        self._dirty = 0
+
+    def flush(self):
+        """把清单写入磁盘"""
+        with self._lock:
+            if self._dirty:
+                self._flush_locked()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self.manifest['files']),
+                'blobs': len(self.manifest['blobs']),
+            }
@@ -0,0 +1,134 @@
+import os
+import time
+import struct
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from lazy_import import lazy_module
+
+from icon_store import write_blob
+from icon_export import export_icon_set
+
+# PIL 在第一次处理图片时才导入（进程池的工作进程也一样）
+Image = lazy_module('PIL.Image')
+
+
+def ico_frames(data):
+    """解析ICO文件目录，返回所有帧的 (宽, 高)，不解码图像数据；不是ICO返回None"""
+    if len(data) < 6:
+        return None
+    reserved, kind, count = struct.unpack_from('<HHH', data, 0)
+    if reserved != 0 or kind not in (1, 2) or count == 0:
+        return None
+    frames = []
+    for i in range(min(count, (len(data) - 6) // 16)):
+        width, height = struct.unpack_from('<BB', data, 6 + i * 16)
+        frames.append((width or 256, height or 256))
+    return frames or None
+
+
+def header_size(data):
+    """只读取文件头得到图片的最大边长（ICO取最大的一帧），无法识别返回None"""
+    data = bytes(data)
+    frames = ico_frames(data)
+    if frames:
+        return max(max(frame) for frame in frames)
+    try:
+        return max(Image.open(BytesIO(data)).size)
+    except Exception:
+        return None
+
+
+def render_icon(data, target_size, blob_dir):
+    """解码一次、缩放到 target_size 的正方形并编码为PNG写入 blob_dir
+
+    target_size 为 None 时保持原始分辨率。在进程池中执行，
+    返回 (像素哈希, 尺寸, 是否新写入, {阶段: 秒})，阶段为 decode / resize / save。
+    """
+    start = time.perf_counter()
+    img = Image.open(BytesIO(data))
+    if img.format == 'ICO':
+        # 多帧ICO显式选择最大的一帧，而不是默认帧
+        img.size = max(img.info['sizes'])
+    img.load()
+    # 转换为RGBA模式以保持透明度
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    decoded = time.perf_counter()
+    if target_size and img.size != (target_size, target_size):
+        img = img.resize((target_size, target_size), Image.Resampling.LANCZOS)
+    resized = time.perf_counter()
+    digest, created = write_blob(blob_dir, img)
+    timings = {'decode': decoded - start, 'resize': resized - decoded, 'save': time.perf_counter() - resized}
+    return digest, img.size, created, timings
+
+
+def render_derivative(src_path, dst_path, size):
+    """从原始图生成 size×size 的派生图，返回写入的字节数"""
+    with Image.open(src_path) as img:
+        img = img.convert('RGBA')
+        if img.size != (size, size):
+            img = img.resize((size, size), Image.Resampling.LANCZOS)
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        tmp_path = f"{dst_path}.{os.getpid()}.tmp"
+        img.save(tmp_path, "PNG")
+    os.replace(tmp_path, dst_path)
+    return os.path.getsize(dst_path)
+
+
+class ImagePipeline:
+    """图片处理阶段：解码、缩放和PNG编码放到进程池里，不占用下载进程的 GIL
+
+    交接是同步的：下载线程提交后等待结果（保存的文件路径和尺寸随即用于结果和去重），
+    等待期间只阻塞这一个名称，其他下载线程照常收发网络数据。
+    进程池不可用时（例如打包环境缺少 freeze_support）自动退回线程池。
+    """
+
+    def __init__(self, max_workers=None, use_processes=True):
+        self.max_workers = max_workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.use_processes = use_processes
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.use_processes:
+                try:
+                    # 用 spawn 启动工作进程（Windows 上本来就是）：下载线程可能正在导入模块（PIL 是延迟导入的），
+                    # fork 会把它们持有的导入锁复制到子进程中，子进程随后卡死
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+                except Exception as e:
+                    print(f"Warning: 进程池不可用，改用线程池: {e}")
+                    self.use_processes = False
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='icon-image')
+        return self._pool
+
+    def _call(self, fn, *args):
+        """在池中同步执行，进程池损坏时改用线程池再试一次"""
+        try:
+            return self._get_pool().submit(fn, *args).result()
+        except BrokenProcessPool:
+            print("Warning: 进程池已损坏，改用线程池")
+            self._pool = None
+            self.use_processes = False
+            return self._get_pool().submit(fn, *args).result()
+
+    def render(self, data, target_size, blob_dir):
+        """同步处理一张下载到的图片"""
+        return self._call(render_icon, bytes(data), target_size, blob_dir)
+
+    def derive(self, src_path, dst_path, size):
+        """同步生成一张派生尺寸的图片"""
+        return self._call(render_derivative, src_path, dst_path, size)
+
+    def export(self, source_path, out_dir, basename, sizes, formats):
+        """同步导出一套多尺寸图标"""
+        return self._call(export_icon_set, source_path, out_dir, basename, sizes, formats)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
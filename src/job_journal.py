@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import threading
+
+
+class JournalMismatch(Exception):
+    """续传的作业日志属于参数不同的任务"""
+
+
+class JobJournal:
+    """批量任务的追加式 JSONL 日志，用于中断后续传
+
+    每行一条记录：
+      {"event": "job", "params", "time"}（任务参数，写在其他记录之前）
+      {"event": "service", "name", "domain", "service", "ok", "filepath", "size", "original_size", "error", "time"}
+      {"event": "name", "name", "domain", "icons", "error", "time"}
+    "name" 记录表示该名称已处理完（包括找不到域名）；因网络异常失败的名称（结果带 failed_sources，
+    见 IconDownloader.download_one）不写 "name" 记录，续传时只重做没成功的服务。
+    记录只按名称匹配，因此 params（尺寸、服务、存储方式等影响结果的参数）不同的任务不能共用一个日志：
+    续传时日志中的参数与 params 不一致（或旧日志没有记录参数）则抛出 JournalMismatch。
+    resume=False 时清空旧日志重新开始。
+    """
+
+    def __init__(self, path, resume=True, params=None):
+        self.path = path
+        # 经过一次 JSON 往返，使元组和列表等价
+        self.params = json.loads(json.dumps(params, ensure_ascii=False)) if params is not None else None
+        self.names = {}     # 名称 → 完成记录
+        self.services = {}  # (名称, 服务) → 成功记录
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        has_job = False
+        if resume:
+            has_job = self._load()
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+        if self.params is not None and not has_job:
+            self._write({'event': 'job', 'params': self.params})
+
+    def _load(self):
+        """读取旧日志，返回其中是否已有本次参数的任务记录"""
+        if not os.path.exists(self.path):
+            return False
+        params = None
+        has_records = False
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 上次中断时可能只写了半行
+                    continue
+                if record.get('event') == 'job':
+                    params = record.get('params')
+                    continue
+                has_records = True
+                if record.get('event') == 'name':
+                    self.names[record['name']] = record
+                elif record.get('event') == 'service' and record.get('ok'):
+                    self.services[(record['name'], record['service'])] = record
+        if self.params is not None and has_records and params != self.params:
+            raise JournalMismatch(f"作业日志 {self.path} 属于参数不同的任务"
+                                  f"（日志: {json.dumps(params, ensure_ascii=False)}，"
+                                  f"本次: {json.dumps(self.params, ensure_ascii=False)}）")
+        # 没有记录的日志沿用即可，参数不同时重新写一条任务记录（读取时以最后一条为准）
+        return params is not None and params == self.params
+
+    def _write(self, record):
+        record['time'] = time.time()
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def record_service(self, name, domain, service, result=None, error=None):
+        """记录一个服务的结果，result 为下载结果字典，None 表示失败"""
+        record = {'event': 'service', 'name': name, 'domain': domain, 'service': service, 'ok': bool(result)}
+        if result:
+            record.update(filepath=result.get('filepath'), size=result.get('size'),
+                          original_size=result.get('original_size'))
+            with self._lock:
+                self.services[(name, service)] = record
+        elif error:
+            record['error'] = str(error)
+        self._write(record)
+
+    def record_name(self, result):
+        """记录一个名称处理完成，result 为 download_one 的返回值；有来源因网络原因失败时不记录，返回False"""
+        if result.get('failed_sources'):
+            return False
+        record = {'event': 'name', 'name': result['name'], 'domain': result.get('domain'),
+                  'icons': result.get('icons') or [], 'error': result.get('error')}
+        if result.get('icon_set'):
+            record['icon_set'] = result['icon_set']
+        with self._lock:
+            self.names[result['name']] = record
+        self._write(record)
+        return True
+
+    def completed(self, name):
+        """已完成且图标文件都还在时返回记录中的结果，否则返回None"""
+        record = self.names.get(name)
+        if record is None:
+            return None
+        if not all(os.path.exists(icon['filepath']) for icon in record['icons']):
+            return None
+        result = {key: value for key, value in record.items() if key not in ('event', 'time')}
+        if result.get('error') is None:
+            result.pop('error', None)
+        return result
+
+    def service_result(self, name, service):
+        """该名称在某服务上已成功下载过且文件还在时，返回下载结果字典"""
+        record = self.services.get((name, service))
+        if record is None or not record.get('filepath') or not os.path.exists(record['filepath']):
+            return None
+        return {'service': service, 'filepath': record['filepath'], 'size': record.get('size'),
+                'original_size': record.get('original_size')}
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import threading
+import types
+
+
+# 延迟导入的模块实际导入时的耗时 {模块名: 秒}，供启动耗时报告使用
+load_times = {}
+_lock = threading.RLock()
+
+
+def _reset_lock():
+    # fork 出的子进程（例如图片处理的进程池）可能复制到被其他线程持有的锁，子进程中换一个新锁
+    global _lock
+    _lock = threading.RLock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_lock)
+
+
+class LazyModule(types.ModuleType):
+    """模块占位对象：第一次访问属性时才真正导入
+
+    用法：requests = lazy_module('requests')，之后像普通模块一样使用 requests.Session()。
+    只有真正用到时才付出导入的代价，程序启动和只用到部分功能的命令行都因此更快。
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+        self.__dict__['_lazy_error'] = None
+
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with _lock:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    # 导入失败只尝试一次，之后直接抛出同样的错误
+                    if self.__dict__['_lazy_error'] is not None:
+                        raise self.__dict__['_lazy_error']
+                    name = self.__name__
+                    start = time.perf_counter()
+                    already_loaded = name in sys.modules
+                    try:
+                        # 经过 __import__ 而不是 importlib，启动计时的导入钩子才能记录到它
+                        __import__(name)
+                        module = sys.modules[name]
+                    except ImportError as e:
+                        self.__dict__['_lazy_error'] = e
+                        raise
+                    if not already_loaded:
+                        load_times[name] = time.perf_counter() - start
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_lazy_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_module(name):
+    """返回 name 模块的延迟导入占位对象；已经导入过的模块直接返回"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
+
+
+def is_available(module):
+    """可选依赖是否可以导入（会触发导入）"""
+    if not isinstance(module, LazyModule):
+        return True
+    try:
+        module._load()
+        return True
+    except ImportError:
+        return False
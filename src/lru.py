@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """线程安全的LRU缓存
+
+    maxsize 限制条目数，max_weight 配合 weigh(value) 限制总权重（例如字节数），
+    被淘汰的条目会回调 on_evict(key, value)，可用于删除对应的文件。
+    """
+
+    def __init__(self, maxsize=1024, max_weight=None, weigh=None, on_evict=None):
+        self.maxsize = maxsize
+        self.max_weight = max_weight
+        self.weigh = weigh or (lambda value: 1)
+        self.on_evict = on_evict
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._data:
+                self.weight -= self.weigh(self._data.pop(key))
+            self._data[key] = value
+            self.weight += self.weigh(value)
+            evicted = self._evict_locked()
+        self._notify(evicted)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data.pop(key)
+            self.weight -= self.weigh(value)
+            return value
+
+    def clear(self):
+        with self._lock:
+            evicted = list(self._data.items())
+            self._data.clear()
+            self.weight = 0
+        self._notify(evicted)
+
+    def _evict_locked(self):
+        evicted = []
+        while self._data and (len(self._data) > self.maxsize or
+                              (self.max_weight is not None and self.weight > self.max_weight)):
+            key, value = self._data.popitem(last=False)
+            self.weight -= self.weigh(value)
+            evicted.append((key, value))
+        return evicted
+
+    def _notify(self, evicted):
+        if self.on_evict:
+            for key, value in evicted:
+                self.on_evict(key, value)
+
+    def stats(self):
+        with self._lock:
+            return {'items': len(self._data), 'weight': self.weight, 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import hashlib
+
+
+# 没有任何映射文件时使用的常见网站映射
+DEFAULT_MAPPINGS = {
+    "支付宝": "alipay.com",
+    "百度": "baidu.com",
+    "淘宝": "taobao.com",
+    "京东": "jd.com",
+    "微信": "weixin.qq.com",
+    "微博": "weibo.com",
+    "知乎": "zhihu.com",
+    "抖音": "douyin.com",
+    "哔哩哔哩": "bilibili.com",
+    "网易": "163.com",
+    "阿里巴巴": "alibaba.com",
+    "腾讯": "qq.com",
+    "谷歌": "google.com",
+    "google": "google.com"
+}
+
+
+# merge_mappings.py 生成的编译索引，记录了生成时各源文件的状态
+COMPILED_INDEX = 'domain_mappings.index.json'
+COMPILED_VERSION = 1
+
+
+def resource_dirs():
+    """映射文件的查找目录，按优先级排列
+
+    打包后的程序优先使用exe旁边的外部文件，其次是打包进去的资源；
+    开发环境下依次是 src 目录和仓库根目录。
+    """
+    dirs = []
+    if getattr(sys, 'frozen', False):
+        dirs.append(os.path.dirname(sys.executable))
+        dirs.append(getattr(sys, '_MEIPASS', ''))
+    here = os.path.dirname(os.path.abspath(__file__))
+    dirs.extend([here, os.path.dirname(here)])
+    return [d for d in dict.fromkeys(dirs) if d]
+
+
+def find_resource(name):
+    """在 resource_dirs() 中查找文件，找不到返回None"""
+    for base in resource_dirs():
+        path = os.path.join(base, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def source_files():
+    """MappingIndex 的源文件 [(相对名称, 路径)]，按加载顺序：
+    domain_mappings.json → domain_mappings/*.json → domains.json
+    """
+    sources = []
+    path = find_resource('domain_mappings.json')
+    if path:
+        sources.append(('domain_mappings.json', path))
+    directory = find_resource('domain_mappings')
+    if directory and os.path.isdir(directory):
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith('.json'):
+                sources.append((f'domain_mappings/{filename}', os.path.join(directory, filename)))
+    path = find_resource('domains.json')
+    if path:
+        sources.append(('domains.json', path))
+    return sources
+
+
+def file_stat(path):
+    """用于判断文件是否变化的 [修改时间(ns), 大小]"""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def sources_unchanged(recorded, sources):
+    """源文件和编译索引中的记录是否一致：修改时间和大小相同即可，
+    不同时（例如刚从 git 检出或由打包程序解压）再比较内容哈希
+    """
+    if set(recorded) != {name for name, _ in sources}:
+        return False
+    for name, path in sources:
+        state = recorded[name]
+        if file_stat(path) != state[:2] and file_hash(path) != state[2]:
+            return False
+    return True
+
+
+def normalize(name):
+    """索引键：去掉首尾空白并做大小写折叠"""
+    return name.strip().casefold()
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: Failed to load {path}: {e}")
+        return None
+
+
+class MappingIndex:
+    """品牌名称/别名 → 域名 的索引
+
+    加载时把所有来源合并成一个以折叠后名称为键的字典，查找只需一次哈希访问。
+    键中用 | 分隔的别名（如 "京东|JD|jd"）会拆开分别建索引。
+    先加入的来源优先，后加入的同名条目不会覆盖。
+    """
+
+    def __init__(self):
+        self.index = {}       # 折叠后的名称 → 域名
+        self.mappings = {}    # 原始名称 → 域名（不拆分别名）
+        self.categories = {}  # 折叠后的名称 → 类别
+        self.sources = []     # 已加载的文件
+        self.pinyin = None    # 折叠后的名称 → 拼音键，从编译索引加载时才有
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return normalize(name) in self.index
+
+    def add(self, key, domain, category=None, override=False):
+        """加入一条映射，key 可以是 | 分隔的多个别名"""
+        if not isinstance(domain, str) or not domain:
+            return
+        if override or key not in self.mappings:
+            self.mappings[key] = domain
+        for alias in key.split('|'):
+            alias = normalize(alias)
+            if not alias:
+                continue
+            if override or alias not in self.index:
+                self.index[alias] = domain
+            if category:
+                self.categories.setdefault(alias, category)
+
+    def update(self, mappings, category=None):
+        for key, domain in mappings.items():
+            self.add(key, domain, category)
+
+    def lookup(self, name):
+        """查找名称对应的域名，找不到返回None"""
+        return self.index.get(normalize(name))
+
+    def category_of(self, name):
+        return self.categories.get(normalize(name))
+
+    def load_flat_file(self, path, category=None):
+        """加载 {名称: 域名} 格式的文件"""
+        data = _read_json(path)
+        if isinstance(data, dict):
+            self.update(data, category)
+            self.sources.append(path)
+
+    def load_mappings_dir(self, path):
+        """加载 domain_mappings/ 下的分类文件，文件名即类别"""
+        for filename in sorted(os.listdir(path)):
+            if filename.endswith('.json'):
+                self.load_flat_file(os.path.join(path, filename), filename[:-5])
+
+    def load_domains_file(self, path):
+        """加载 domains.json：categories 下按类别分组，aliases 为额外别名"""
+        data = _read_json(path)
+        if not isinstance(data, dict):
+            return
+        self.update_domains(data)
+        self.sources.append(path)
+
+    def update_domains(self, data):
+        """加入 domains.json 格式的内容"""
+        for category, mappings in data.get('categories', {}).items():
+            if isinstance(mappings, dict):
+                self.update(mappings, category)
+        self.update(data.get('aliases', {}))
+
+    def load_source(self, name, path):
+        """按 source_files() 中的相对名称选择加载方式"""
+        if name == 'domains.json':
+            self.load_domains_file(path)
+        elif name.startswith('domain_mappings/'):
+            self.load_flat_file(path, os.path.basename(name)[:-5])
+        else:
+            self.load_flat_file(path)
+
+    @classmethod
+    def build(cls, sources=None):
+        """从源文件构建索引，最后加入内置默认映射"""
+        index = cls()
+        for name, path in sources if sources is not None else source_files():
+            index.load_source(name, path)
+        index.update(DEFAULT_MAPPINGS)
+        return index
+
+    @classmethod
+    def load(cls):
+        """优先加载编译索引（源文件都没变时），否则从所有源文件构建"""
+        path = find_resource(COMPILED_INDEX)
+        if path:
+            index = cls.load_compiled(path)
+            if index is not None:
+                return index
+        return cls.build()
+
+    @classmethod
+    def load_compiled(cls, path, sources=None):
+        """加载编译索引；格式不对或任一源文件的内容与记录不符时返回None"""
+        data = _read_json(path)
+        if not isinstance(data, dict) or data.get('version') != COMPILED_VERSION:
+            return None
+        if not sources_unchanged(data['sources'], sources if sources is not None else source_files()):
+            print(f"映射索引已过期，改为读取源文件（运行 merge_mappings.py 可重新生成 {COMPILED_INDEX}）")
+            return None
+        domains = data['domains']
+        categories = data['categories']
+        index = cls()
+        index.index = {key: domains[d] for key, d, _ in data['index']}
+        index.categories = {key: categories[c] for key, _, c in data['index'] if c >= 0}
+        index.mappings = {key: domains[d] for key, d in data['mappings']}
+        index.pinyin = data.get('pinyin', {})
+        index.sources = [path]
+        return index
+
+    def compile(self, sources_state, pinyin):
+        """生成编译索引的内容：域名和类别去重后以序号引用，sources_state 为 {相对名称: [修改时间, 大小, sha256]}"""
+        domains = sorted(set(self.index.values()) | set(self.mappings.values()))
+        categories = sorted(set(self.categories.values()))
+        domain_ids = {domain: i for i, domain in enumerate(domains)}
+        category_ids = {category: i for i, category in enumerate(categories)}
+        return {
+            'version': COMPILED_VERSION,
+            'sources': sources_state,
+            'domains': domains,
+            'categories': categories,
+            'index': [[key, domain_ids[domain], category_ids.get(self.categories.get(key), -1)]
+                      for key, domain in self.index.items()],
+            'mappings': [[key, domain_ids[domain]] for key, domain in self.mappings.items()],
+            'pinyin': pinyin,
+        }
@@ -1,31 +1,245 @@
 import os
 import json
+import argparse
 
-def merge_json_files():
-    # 获取所有JSON文件
-    json_dir = "domain_mappings"
-    merged_mappings = {}
-    
-    # 遍历目录中的所有JSON文件
-    for filename in os.listdir(json_dir):
-        if filename.endswith(".json"):
-            file_path = os.path.join(json_dir, filename)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
+from mapping_index import COMPILED_INDEX, DEFAULT_MAPPINGS, MappingIndex, file_hash, file_stat, normalize
+from fuzzy_index import pinyin_keys
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_state(index_path):
+    """上次生成的编译索引中记录的源文件状态、拼音键和各分类文件的内容"""
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get('sources', {}), data.get('pinyin', {}), data.get('merged', {})
+    except Exception:
+        return {}, {}, {}
+
+
+def scan_sources(sources, state):
+    """检查源文件是否变化：修改时间和大小都没变直接认为没变，否则再比较内容哈希
+
+    返回 (新状态 {相对名称: [修改时间, 大小, sha256]}, 内容有变化的文件列表)
+    """
+    new_state = {}
+    changed = []
+    for name, path in sources:
+        stat = file_stat(path)
+        old = state.get(name)
+        if old and old[:2] == stat:
+            new_state[name] = old
+            continue
+        digest = file_hash(path)
+        new_state[name] = stat + [digest]
+        if not old or old[2] != digest:
+            changed.append(name)
+    return new_state, changed
+
+
+def read_json_file(path):
+    """读取一个映射文件，格式错误时报告并返回None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error reading {os.path.basename(path)}: {str(e)}")
+        return None
+
+
+def domains_entries(data):
+    """domains.json 中的所有 {名称: 域名}（各类别和 aliases）"""
+    entries = {}
+    if isinstance(data, dict):
+        for mappings in list(data.get('categories', {}).values()) + [data.get('aliases', {})]:
+            if isinstance(mappings, dict):
+                entries.update(mappings)
+    return entries
+
+
+def merge_contributions(merged, old, new, affected_files):
+    """把有变化的分类文件合并进现有的 domain_mappings.json 内容（就地修改 merged）
+
+    old / new 为上次 / 本次各分类文件的内容 {相对名称: {名称: 域名}}（按文件名顺序），
+    只重新计算 affected_files 涉及的键，同一个键以后面的文件为准。
+    不来自分类文件的条目（add_domain_mapping 添加的）和与上次合并结果不同的条目（手动修改的）保留不动。
+    返回这些手动条目 {名称: 域名}。
+    """
+    def winner(contributions, key):
+        value = None
+        for data in contributions.values():
+            value = data.get(key, value)
+        return value
+
+    manual = {}
+    for key, domain in merged.items():
+        previous = winner(old, key)
+        # 没有上次的记录时（第一次运行），分类文件中有的键以分类文件为准
+        if previous is None and (old or winner(new, key) is None) or previous not in (None, domain):
+            manual[key] = domain
+
+    affected = set()
+    for name in affected_files:
+        affected.update(old.get(name, {}), new.get(name, {}))
+    updated = 0
+    for key in affected - set(manual):
+        value = winner(new, key)
+        if merged.get(key) != value:
+            updated += 1
+            if value is None:
+                del merged[key]
+            else:
+                merged[key] = value
+    return manual, updated
+
+
+def find_conflicts(files):
+    """键冲突：同一个键在不同文件中对应不同域名；
+    别名冲突：不同键拆分出的别名折叠后相同，但对应不同域名
+    """
+    keys = {}
+    aliases = {}
+    for filename, data in files:
+        for key, domain in data.items():
+            keys.setdefault(key, []).append((filename, domain))
+            for alias in dict.fromkeys(normalize(alias) for alias in key.split('|')):
+                if alias:
+                    aliases.setdefault(alias, []).append((filename, key, domain))
+    key_conflicts = {key: owners for key, owners in keys.items()
+                     if len({domain for _, domain in owners}) > 1}
+    alias_conflicts = {alias: owners for alias, owners in aliases.items()
+                       if len({domain for _, _, domain in owners}) > 1 and len({key for _, key, _ in owners}) > 1}
+    return key_conflicts, alias_conflicts
+
+
+def report_conflicts(key_conflicts, alias_conflicts, index):
+    """报告冲突以及索引中实际生效的域名"""
+    for key, owners in sorted(key_conflicts.items()):
+        detail = '，'.join(f"{filename}: {domain}" for filename, domain in owners)
+        print(f"键冲突 {key}: {detail}（生效的是 {index.mappings.get(key)}）")
+    for alias, owners in sorted(alias_conflicts.items()):
+        detail = '，'.join(f"{filename} {key!r}: {domain}" for filename, key, domain in owners)
+        print(f"别名冲突 {alias}: {detail}（生效的是 {index.lookup(alias)}）")
+    if key_conflicts or alias_conflicts:
+        print(f"共 {len(key_conflicts)} 个键冲突，{len(alias_conflicts)} 个别名冲突")
+
+
+def write_if_changed(path, text):
+    """内容相同时不改写，避免更新修改时间"""
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                return False
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return True
+
+
+def category_sources(root):
+    json_dir = os.path.join(root, "domain_mappings")
+    return [(f"domain_mappings/{filename}", os.path.join(json_dir, filename))
+            for filename in sorted(os.listdir(json_dir)) if filename.endswith(".json")]
+
+
+def index_sources(root):
+    """编译索引的源文件，与 mapping_index.source_files() 的顺序一致"""
+    sources = [("domain_mappings.json", os.path.join(root, "domain_mappings.json"))]
+    sources += category_sources(root)
+    domains_path = os.path.join(root, "domains.json")
+    if os.path.exists(domains_path):
+        sources.append(("domains.json", domains_path))
+    return sources
+
+
+def merge_json_files(root=ROOT_DIR, force=False):
+    """把分类文件增量合并进 domain_mappings.json，并生成编译索引 domain_mappings.index.json
+
+    编译索引中记录了各分类文件上次的内容，只读取和合并有变化的源文件；
+    拼音键按名称复用上次的结果。冲突检查包括所有分类文件、domains.json 和 domain_mappings.json 中手动添加的条目。
+    """
+    merged_path = os.path.join(root, "domain_mappings.json")
+    index_path = os.path.join(root, COMPILED_INDEX)
+    state, old_pinyin, old_contributions = load_state(index_path)
+
+    categories = category_sources(root)
+    inputs = list(categories)
+    domains_path = os.path.join(root, "domains.json")
+    if os.path.exists(domains_path):
+        inputs.append(("domains.json", domains_path))
+    input_state, changed = scan_sources(inputs, state)
+    # 被删除的源文件也算变化
+    changed += [name for name in state if name != "domain_mappings.json" and name not in input_state]
+    # 没有记录内容的分类文件（旧版本生成的索引）需要读取
+    unknown = [name for name, _ in categories if name not in old_contributions]
+    if not changed and not unknown and not force and os.path.exists(merged_path) and os.path.exists(index_path):
+        merged_stat = file_stat(merged_path)
+        if state.get("domain_mappings.json", [None, None])[:2] == merged_stat:
+            if input_state != {name: state[name] for name in input_state}:
+                # 只有修改时间变了，更新记录以便启动时直接使用编译索引
+                with open(index_path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    # 合并映射
-                    merged_mappings.update(data)
-            except Exception as e:
-                print(f"Error reading {filename}: {str(e)}")
-    
-    # 按键排序
-    sorted_mappings = dict(sorted(merged_mappings.items()))
-    
-    # 保存合并后的文件
-    with open("domain_mappings.json", 'w', encoding='utf-8') as f:
-        json.dump(sorted_mappings, f, ensure_ascii=False, indent=4)
-    
-    print(f"合并完成！共有 {len(sorted_mappings)} 个域名映射")
+                data['sources'].update(input_state)
+                write_if_changed(index_path, json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+            print("映射没有变化，跳过合并")
+            return
+    if changed:
+        print(f"有变化的源文件: {', '.join(changed)}")
+
+    # 只读取有变化的分类文件，其余使用上次记录的内容；格式错误的文件按空文件处理
+    affected = [name for name in old_contributions if name not in dict(categories)]
+    contributions = {}
+    for name, path in categories:
+        if force or name in changed or name not in old_contributions:
+            data = read_json_file(path)
+            contributions[name] = data if isinstance(data, dict) else {}
+            affected.append(name)
+        else:
+            contributions[name] = old_contributions[name]
+
+    merged = read_json_file(merged_path) if os.path.exists(merged_path) else None
+    merged = merged if isinstance(merged, dict) else {}
+    manual, updated = merge_contributions(merged, old_contributions, contributions, affected)
+    sorted_mappings = dict(sorted(merged.items()))
+    if write_if_changed(merged_path, json.dumps(sorted_mappings, ensure_ascii=False, indent=4)):
+        print(f"合并完成！更新了 {updated} 个映射，共有 {len(sorted_mappings)} 个域名映射")
+    if manual:
+        print(f"保留了 {len(manual)} 个不来自分类文件或被手动修改的映射")
+
+    # 生成编译索引：与 MappingIndex.build 相同的加载顺序，直接使用内存中的内容
+    domains_data = read_json_file(domains_path) if os.path.exists(domains_path) else None
+    index = MappingIndex()
+    index.update(sorted_mappings)
+    for name, data in contributions.items():
+        index.update(data, os.path.basename(name)[:-5])
+    if isinstance(domains_data, dict):
+        index.update_domains(domains_data)
+    index.update(DEFAULT_MAPPINGS)
+
+    files = [("domain_mappings.json", manual)]
+    files += [(os.path.basename(name), data) for name, data in contributions.items()]
+    files.append(("domains.json", domains_entries(domains_data)))
+    report_conflicts(*find_conflicts(files), index)
+
+    sources_state, _ = scan_sources(index_sources(root), state)
+    pinyin = {}
+    for key in index.index:
+        keys = old_pinyin[key] if key in old_pinyin else pinyin_keys(key)
+        if keys:
+            pinyin[key] = keys
+    compiled = index.compile(sources_state, pinyin)
+    # 各分类文件的内容，下次只需读取有变化的文件（MappingIndex 不使用）
+    compiled['merged'] = contributions
+    write_if_changed(index_path, json.dumps(compiled, ensure_ascii=False, separators=(',', ':')))
+    print(f"已生成 {COMPILED_INDEX}：{len(index)} 个名称/别名，{len(pinyin)} 个拼音键")
+
 
 if __name__ == "__main__":
-    merge_json_files() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="合并 domain_mappings/ 下的分类文件并生成编译索引")
+    parser.add_argument('--root', default=ROOT_DIR, help="包含 domain_mappings/ 的目录，默认仓库根目录")
+    parser.add_argument('--force', action='store_true', help="即使源文件没有变化也重新生成")
+    args = parser.parse_args()
+    merge_json_files(args.root, args.force)
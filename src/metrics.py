@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# 耗时直方图的桶上限（秒），与 Prometheus 客户端的默认值一致
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# 每个服务的计数项：拿到图标、没有可用图标、超时、其他错误、响应字节数、由缓存直接提供、断路器断开而跳过
+SERVICE_EVENTS = ('hits', 'misses', 'timeouts', 'errors', 'bytes', 'cached', 'skipped')
+
+
+class StageStats:
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+
+
+class Metrics:
+    """进程内的分阶段计时和按服务计数
+
+    span(阶段, 服务) 统计一个阶段的次数、总耗时、最大耗时和耗时分布（直方图）；
+    在别处（例如图片进程池）测得的耗时用 observe() 记入。count(项, 服务, 值) 累加服务计数，见 SERVICE_EVENTS。
+    各阶段在多个线程中同时进行，因此总耗时是各线程耗时之和，可以超过墙钟时间。
+    线程安全；export(path) 按扩展名写出 JSON 摘要（.json）或 Prometheus 文本格式（.prom/.txt）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._start = time.perf_counter()
+            self.stages = {}
+            self.services = {}
+
+    @contextmanager
+    def span(self, stage, service=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, service)
+
+    def observe(self, stage, seconds, service=None):
+        with self._lock:
+            stats = self.stages.get((stage, service))
+            if stats is None:
+                stats = self.stages[(stage, service)] = StageStats()
+            stats.add(seconds)
+
+    def count(self, event, service, value=1):
+        with self._lock:
+            counters = self.services.get(service)
+            if counters is None:
+                counters = self.services[service] = dict.fromkeys(SERVICE_EVENTS, 0)
+            counters[event] = counters.get(event, 0) + value
+
+    def summary(self):
+        """JSON 摘要：各阶段按总耗时从大到小排列"""
+        with self._lock:
+            elapsed = time.perf_counter() - self._start
+            stages = [{
+                'stage': stage,
+                'service': service,
+                'count': stats.count,
+                'total_seconds': round(stats.total, 3),
+                'mean_ms': round(stats.total / stats.count * 1000, 1),
+                'max_ms': round(stats.max * 1000, 1),
+                'share': round(stats.total / elapsed, 3) if elapsed else None,
+            } for (stage, service), stats in self.stages.items()]
+            services = {service: dict(counters) for service, counters in self.services.items()}
+        stages.sort(key=lambda item: item['total_seconds'], reverse=True)
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'elapsed_seconds': round(elapsed, 3),
+            'stages': stages,
+            'services': services,
+        }
+
+    def report(self, limit=15):
+        """文本形式的摘要，用于日志"""
+        summary = self.summary()
+        lines = [f"耗时分布（总耗时为各线程之和，墙钟时间 {summary['elapsed_seconds']:.1f} 秒）："]
+        for item in summary['stages'][:limit]:
+            name = f"{item['stage']}[{item['service']}]" if item['service'] else item['stage']
+            lines.append(f"  {name:<28} {item['count']:>6} 次  总 {item['total_seconds']:>8.2f} s  "
+                         f"平均 {item['mean_ms']:>8.1f} ms  最大 {item['max_ms']:>8.1f} ms")
+        for service, counters in sorted(summary['services'].items()):
+            detail = '  '.join(f"{event} {value}" for event, value in counters.items())
+            lines.append(f"  {service}: {detail}")
+        return '\n'.join(lines)
+
+    def prometheus(self):
+        """Prometheus 文本格式"""
+        lines = [
+            "# HELP icon_stage_seconds 各处理阶段的耗时",
+            "# TYPE icon_stage_seconds histogram",
+        ]
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: (item[0][0], item[0][1] or ''))
+            for (stage, service), stats in stages:
+                labels = f'stage="{_escape(stage)}"'
+                if service:
+                    labels += f',service="{_escape(service)}"'
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS + (float('inf'),), stats.buckets):
+                    cumulative += bucket
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'icon_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f'icon_stage_seconds_sum{{{labels}}} {stats.total:.6f}')
+                lines.append(f'icon_stage_seconds_count{{{labels}}} {stats.count}')
+            lines += [
+                "# HELP icon_service_events_total 各图标来源的结果计数",
+                "# TYPE icon_service_events_total counter",
+            ]
+            services = sorted(self.services.items())
+            for service, counters in services:
+                for event, value in counters.items():
+                    if event != 'bytes':
+                        lines.append(f'icon_service_events_total{{service="{_escape(service)}",event="{event}"}} {value}')
+            lines += [
+                "# HELP icon_service_bytes_total 各图标来源的响应字节数",
+                "# TYPE icon_service_bytes_total counter",
+            ]
+            for service, counters in services:
+                lines.append(f'icon_service_bytes_total{{service="{_escape(service)}"}} {counters.get("bytes", 0)}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """写出摘要：.prom/.txt 为 Prometheus 文本格式，其余为 JSON"""
+        if path.lower().endswith(('.prom', '.txt')):
+            text = self.prometheus()
+        else:
+            text = json.dumps(self.summary(), ensure_ascii=False, indent=2)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        return path
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,167 @@
+import time
+import threading
+from collections import deque
+
+
+# 滚动统计最近多少次请求
+WINDOW = 20
+# 连续失败多少次后断开
+FAILURE_THRESHOLD = 3
+# 断开后等待多久（秒）放行一次试探请求；试探失败时翻倍，最长 MAX_COOLDOWN
+COOLDOWN = 30
+MAX_COOLDOWN = 600
+# 没有记录时假定的耗时（秒）
+DEFAULT_LATENCY = 1.0
+
+
+class CircuitOpen(Exception):
+    """服务的断路器处于断开状态，本次不发出请求"""
+
+
+class CircuitBreaker:
+    """断路器：closed（正常）→ 连续失败 threshold 次 → open（拒绝请求）
+    → 等待 cooldown 秒 → half_open（只放行一个试探请求）→ 成功则 closed，失败则重新 open 且等待时间翻倍
+    """
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN, max_cooldown=MAX_COOLDOWN, clock=time.monotonic):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = None
+
+    def allow(self):
+        if self.state == 'closed':
+            return True
+        now = self.clock()
+        if self.state == 'open':
+            if now - self.opened_at < self.cooldown:
+                return False
+            self.state = 'half_open'
+        # 试探请求没有返回结果（例如被取消）时，过了 cooldown 再放行一个
+        if self.probe_started is not None and now - self.probe_started < self.cooldown:
+            return False
+        self.probe_started = now
+        return True
+
+    def record_success(self):
+        self.state = 'closed'
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+        self.probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == 'half_open':
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self._open()
+        elif self.state == 'closed' and self.failures >= self.threshold:
+            self._open()
+
+    def _open(self):
+        self.state = 'open'
+        self.opened_at = self.clock()
+        self.probe_started = None
+
+
+class ServiceHealth:
+    """单个服务最近 WINDOW 次请求的成功率和耗时，以及它的断路器"""
+
+    def __init__(self, window=WINDOW, **breaker_options):
+        self.results = deque(maxlen=window)
+        self.breaker = CircuitBreaker(**breaker_options)
+
+    def success_rate(self):
+        if not self.results:
+            return 1.0
+        return sum(1 for ok, _ in self.results if ok) / len(self.results)
+
+    def latency(self):
+        """成功请求的平均耗时，没有记录返回None"""
+        latencies = [seconds for ok, seconds in self.results if ok]
+        return sum(latencies) / len(latencies) if latencies else None
+
+
+class HealthTracker:
+    """各图标服务的健康状况：滚动成功率和耗时、断路器，以及据此排序
+
+    失败指服务本身不可用（连接失败、超时、5xx、429），服务正常回答“没有这个图标”（404 等）算成功。
+    持续失败的服务被断开，期间请求直接跳过，不再让每个名称都等满超时；
+    冷却后放行一个试探请求，恢复了就重新启用。
+    """
+
+    def __init__(self, window=WINDOW, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN, max_cooldown=MAX_COOLDOWN,
+                 clock=time.monotonic):
+        self.window = window
+        self.breaker_options = {'threshold': threshold, 'cooldown': cooldown, 'max_cooldown': max_cooldown,
+                                'clock': clock}
+        self.services = {}
+        self._lock = threading.Lock()
+
+    def _health(self, service):
+        health = self.services.get(service)
+        if health is None:
+            health = self.services[service] = ServiceHealth(self.window, **self.breaker_options)
+        return health
+
+    def allow(self, service):
+        """是否可以向该服务发请求；断开期间返回False"""
+        with self._lock:
+            return self._health(service).breaker.allow()
+
+    def record(self, service, ok, latency):
+        with self._lock:
+            health = self._health(service)
+            health.results.append((ok, latency))
+            if ok:
+                health.breaker.record_success()
+            else:
+                health.breaker.record_failure()
+                if health.breaker.state == 'open':
+                    print(f"{service} 连续失败，暂停使用 {health.breaker.cooldown:.0f} 秒")
+
+    def latency(self, service):
+        """该服务成功请求的平均耗时（秒），没有记录返回None"""
+        with self._lock:
+            health = self.services.get(service)
+            return health.latency() if health is not None else None
+
+    def is_open(self, service):
+        with self._lock:
+            health = self.services.get(service)
+            return health is not None and health.breaker.state != 'closed'
+
+    def order(self, services, weight=None):
+        """断开的服务排在最后，其余按 成功率 × weight(服务) ÷ 平均耗时 从高到低排列
+
+        weight 是可选的基础得分（例如 ServiceHistory 中图标的质量）；没有记录的服务按
+        成功率 1、平均耗时为已知服务的中位数（或 DEFAULT_LATENCY）计算，得分相同保持原顺序。
+        """
+        with self._lock:
+            known = sorted(latency for latency in (self.services[s].latency() for s in services if s in self.services)
+                           if latency is not None)
+            typical = known[len(known) // 2] if known else DEFAULT_LATENCY
+            keys = {}
+            for service in services:
+                health = self.services.get(service)
+                if health is None:
+                    rate, latency, is_open = 1.0, typical, False
+                else:
+                    rate, latency, is_open = health.success_rate(), health.latency() or typical, health.breaker.state != 'closed'
+                base = weight(service) if weight else 1.0
+                keys[service] = (is_open, -(rate * base) / max(latency, 0.01))
+        return sorted(services, key=lambda service: keys[service])
+
+    def snapshot(self):
+        """各服务的状态，用于统计接口和日志"""
+        with self._lock:
+            return {service: {
+                'state': health.breaker.state,
+                'success_rate': round(health.success_rate(), 3),
+                'latency_ms': round(health.latency() * 1000, 1) if health.latency() is not None else None,
+                'requests': len(health.results),
+            } for service, health in self.services.items()}
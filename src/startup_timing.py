@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import time
+import builtins
+import threading
+
+import lazy_import
+
+
+# 报告中只列出累计耗时不少于这个值（秒）的导入
+REPORT_MIN_SECONDS = 0.002
+# 报告中导入树的最大缩进层数
+REPORT_MAX_DEPTH = 2
+# 设置这个环境变量（或 GUI 加 --startup-report 参数）时在启动后打印耗时报告
+REPORT_ENV = 'ICON_STARTUP_REPORT'
+
+
+class StartupTimer:
+    """启动耗时统计：类似 python -X importtime 的导入耗时，加上启动各阶段的时间点
+
+    install() 后替换 builtins.__import__，记录每个模块首次导入的累计耗时（包括它导入的依赖）和嵌套深度；
+    已经导入过的模块直接放行，几乎没有额外开销。mark(阶段) 记录从计时开始到此刻的时间，
+    finish() 卸下导入钩子并把本次的各阶段耗时追加到 JSONL 文件，作为可以跟踪的启动指标。
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = []
+        self.imports = []
+        self._builtin_import = builtins.__import__
+        self._local = threading.local()
+        self._recorded = set()
+        self._lock = threading.Lock()
+        self._installed = False
+
+    def install(self):
+        if not self._installed:
+            self._installed = True
+            builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._installed:
+            self._installed = False
+            if builtins.__import__ is self._import:
+                builtins.__import__ = self._builtin_import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._builtin_import(name, globals, locals, fromlist, level)
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            return self._builtin_import(name, globals, locals, fromlist, level)
+        finally:
+            self._local.depth = depth
+            if name in sys.modules:
+                # 多个线程同时导入同一个模块时只记录一次
+                with self._lock:
+                    if name not in self._recorded:
+                        self._recorded.add(name)
+                        self.imports.append((depth, name, time.perf_counter() - start))
+
+    def mark(self, phase):
+        """记录一个启动阶段，返回从计时开始到现在的秒数"""
+        elapsed = time.perf_counter() - self.start
+        self.marks.append((phase, elapsed))
+        return elapsed
+
+    def top_imports(self, limit=10):
+        """最顶层（深度为0）的导入，按耗时从大到小"""
+        top = dict(lazy_import.load_times)
+        top.update((name, seconds) for depth, name, seconds in self.imports if depth == 0)
+        return sorted(top.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def report(self):
+        """文本报告：各阶段时间、导入树（完成顺序，子模块缩进在前）和延迟导入"""
+        lines = ["启动耗时："]
+        for phase, seconds in self.marks:
+            lines.append(f"  {phase:<12} {seconds * 1000:8.1f} ms")
+        lines.append("导入耗时（累计，ms）：")
+        for depth, name, seconds in self.imports:
+            if depth <= REPORT_MAX_DEPTH and seconds >= REPORT_MIN_SECONDS:
+                lines.append(f"  {seconds * 1000:8.1f}  {'  ' * depth}{name}")
+        if lazy_import.load_times:
+            lines.append("延迟导入（首次使用时，ms）：")
+            for name, seconds in sorted(lazy_import.load_times.items(), key=lambda item: item[1], reverse=True):
+                lines.append(f"  {seconds * 1000:8.1f}  {name}")
+        return '\n'.join(lines)
+
+    def finish(self, metrics_path=None, print_report=False):
+        """结束计时：卸下导入钩子，追加一条启动指标，需要时打印报告"""
+        self.uninstall()
+        if metrics_path:
+            entry = {
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'frozen': bool(getattr(sys, 'frozen', False)),
+                'phases': {phase: round(seconds * 1000, 1) for phase, seconds in self.marks},
+                'imports': {name: round(seconds * 1000, 1) for name, seconds in self.top_imports()},
+            }
+            try:
+                os.makedirs(os.path.dirname(metrics_path), exist_ok=True)
+                with open(metrics_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            except OSError as e:
+                print(f"Warning: 无法写入启动耗时记录 {metrics_path}: {str(e)}")
+        if print_report:
+            print(self.report())
+
+
+def report_requested(argv=None):
+    """命令行带 --startup-report 或设置了 ICON_STARTUP_REPORT 环境变量"""
+    argv = sys.argv[1:] if argv is None else argv
+    return '--startup-report' in argv or bool(os.environ.get(REPORT_ENV))
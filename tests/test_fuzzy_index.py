@@ -0,0 +1,41 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from fuzzy_index import FuzzyIndex
+from mapping_index import MappingIndex
+
+
+def make_index(mappings, pinyin):
+    mapping_index = MappingIndex()
+    mapping_index.update(mappings)
+    mapping_index.pinyin = pinyin
+    return FuzzyIndex.from_mapping(mapping_index)
+
+
+def test_colliding_initials_are_not_accepted():
+    index = make_index(
+        {'淘宝': 'taobao.com', '贴吧': 'tieba.baidu.com', '听伴': 'tingban.com'},
+        {'淘宝': ['taobao', 'tb'], '贴吧': ['tieba', 'tb'], '听伴': ['tingban', 'tb']},
+    )
+    assert index.best('tb') is None
+    suggested = {c.domain for c in index.search('tb') if c.key == 'tb'}
+    assert suggested == {'taobao.com', 'tieba.baidu.com', 'tingban.com'}
+
+
+def test_full_pinyin_and_label_are_accepted():
+    index = make_index(
+        {'淘宝': 'taobao.com', '贴吧': 'tieba.baidu.com'},
+        {'淘宝': ['taobao', 'tb'], '贴吧': ['tieba', 'tb']},
+    )
+    assert index.best('taobao').domain == 'taobao.com'
+    assert index.best('TieBa').domain == 'tieba.baidu.com'
+
+
+def test_unique_initials_and_typos_are_only_suggested():
+    index = make_index({'支付宝': 'alipay.com'}, {'支付宝': ['zhifubao', 'zfb']})
+    assert index.best('zfb') is None
+    assert index.best('alipy') is None
+    assert index.search('zfb')[0].domain == 'alipay.com'
+    assert index.search('alipy')[0].domain == 'alipay.com'
@@ -6,11 +6,17 @@ a = Analysis(
     ['src/icon_downloader_gui.py'],
     pathex=[],
     binaries=[],
+    # 域名映射、分类映射和编译索引（含预先生成的拼音键）；缺少索引或源文件时，
+    # 打包后的程序每次启动都要从源文件重建索引并导入 pypinyin
     datas=[
         ('domain_mappings.json', '.'),
+        ('domains.json', '.'),
+        ('domain_mappings/*.json', 'domain_mappings'),
+        ('domain_mappings.index.json', '.'),
         ('src/*.py', 'src/'),
     ],
-    hiddenimports=[],
+    # 这些模块通过 lazy_import.lazy_module 延迟导入，静态分析发现不了
+    hiddenimports=['requests', 'tqdm', 'PIL.Image', 'PIL.ImageTk', 'pypinyin'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],